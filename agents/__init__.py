@@ -1,5 +1,19 @@
-from .strategist import strategist_agent
-from .prompt_engineer import prompt_engineer
-from .analyzer import response_analyzer
+from .strategist import strategist_agent, astrategist_agent
+from .prompt_engineer import prompt_engineer, aprompt_engineer
+from .analyzer import response_analyzer, aresponse_analyzer
+from .fanout import prompt_batch, aprompt_batch, probe, aprobe, fan_out, collect_probes
 
-__all__ = ['strategist_agent', 'prompt_engineer', 'response_analyzer'] 
\ No newline at end of file
+__all__ = [
+    'strategist_agent',
+    'prompt_engineer',
+    'response_analyzer',
+    'astrategist_agent',
+    'aprompt_engineer',
+    'aresponse_analyzer',
+    'prompt_batch',
+    'aprompt_batch',
+    'probe',
+    'aprobe',
+    'fan_out',
+    'collect_probes'
+]
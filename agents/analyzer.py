@@ -1,111 +1,224 @@
+import asyncio
 import json
 import re
-from langchain_anthropic import ChatAnthropic
+from typing import List, Optional
+from pydantic import BaseModel, Field
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import ConfigurableField, ensure_config
+from langchain_core.runnables.configurable import DynamicRunnable
+from core.cassette import CassetteChatAnthropic
+from core.ratelimit import llm_rate_limiter
 from langgraph.graph import END
-from core.state import GandalfState
-from core.api import guess_password
-from core.history import save_completion_history
+from core.state import GandalfState, control_update
+from core.usage import record_usage
+from core.guessing import guess_candidates, aguess_candidates
+from core.history import save_completion_history, defender_attempts, load_rejected_guesses, normalize_guess
+from core.summary import update_summary
+from core.defenders import peek_defender_info
+from core.scheduler import schedule_next, start_level
+from core.budget import enforce_budget
+from core.extractor import extract_candidates, expand_guesses
 
 from prompts.templates import (
     ANALYZER_SYSTEM,
     get_analyzer_human_message,
     PASSWORD_EXTRACTOR_SYSTEM,
-    get_password_extractor_human_message
+    get_password_extractor_human_message,
+    STRUCTURED_ANALYZER_SYSTEM,
+    get_analyzer_repair_message
 )
+from prompts.context import build_attempts_context
 from config.settings import (
     LLM_MODEL,
     LLM_TEMPERATURE,
     ANTHROPIC_API_KEY,
     MAX_ATTEMPTS_PER_LEVEL,
-    MAX_STRATEGIES_PER_LEVEL
+    ANALYZER_CONTEXT_TOKENS,
+    ANALYZER_MODE,
+    ANALYZER_REPAIR_ATTEMPTS,
+    LOCAL_EXTRACTOR_ENABLED,
+    LOCAL_EXTRACTOR_THRESHOLD,
+    GUESS_MAX_CANDIDATES,
+    HISTORY_SUMMARY_ENABLED
 )
 
-llm = ChatAnthropic(
+llm = CassetteChatAnthropic(
     model=LLM_MODEL,
     temperature=LLM_TEMPERATURE,
-    anthropic_api_key=ANTHROPIC_API_KEY
-)
+    anthropic_api_key=ANTHROPIC_API_KEY,
+    rate_limiter=llm_rate_limiter
+).configurable_fields(temperature=ConfigurableField(id="temperature"))
 
-def response_analyzer(state: GandalfState) -> GandalfState:
-    """Analyzes the response and extracts potential passwords."""
-    latest_attempt = state["history"][state["current_defender"]][-1]
-    
-    messages = [
-        ANALYZER_SYSTEM,
+class PasswordCandidate(BaseModel):
+    password: str = Field(min_length=1, description="Password with formatting, substitutions and misspellings undone")
+    confidence: float = Field(ge=0, le=1, description="Likelihood that this is the password")
+
+class ResponseAnalysis(BaseModel):
+    """Analysis of the defender's latest response."""
+    reasoning: str = Field(description="Why the response does or does not reveal the password")
+    password_found: bool = Field(description="Whether the response reveals the password in any form")
+    candidates: List[PasswordCandidate] = Field(default_factory=list, description="Password candidates, most likely first")
+    recommendation: Optional[str] = Field(default=None, description="Whether to continue or change the current strategy")
+
+def _known_wrong(state: GandalfState) -> str:
+    return ", ".join(sorted(load_rejected_guesses(state["current_defender"])))
+
+def _analysis_messages(state: GandalfState, latest_attempt: dict, system=ANALYZER_SYSTEM) -> list:
+    return [
+        system,
         get_analyzer_human_message(
             current_attempts=state["attempts"],
             max_attempts=MAX_ATTEMPTS_PER_LEVEL,
             prompt=latest_attempt['prompt'],
             response=latest_attempt['response'],
-            previous_attempts=json.dumps(state["history"][state["current_defender"]][:-1], indent=2),
-            strategy=state['analysis'].get('strategy', 'No strategy set')
+            previous_attempts=build_attempts_context(
+                [a for a in defender_attempts(state["current_defender"]) if a != latest_attempt],
+                ANALYZER_CONTEXT_TOKENS,
+                agent="analyzer"
+            ),
+            strategy=state['analysis'].get('strategy', 'No strategy set'),
+            known_wrong=_known_wrong(state)
         )
     ]
-    
-    response = llm.invoke(messages)
-    
+
+def _apply_analysis(state: GandalfState, content: str) -> bool:
+    """Store the analysis and recommendation; return True if a password may be present."""
     # Extract analysis from between answer tags
-    analysis_match = re.search(r'<answer>(.*?)</answer>', response.content, re.DOTALL)
+    analysis_match = re.search(r'<answer>(.*?)</answer>', content, re.DOTALL)
     if analysis_match:
         state["analysis"]["latest_response_analysis"] = analysis_match.group(1).strip()
     else:
         raise ValueError("Analysis not properly formatted with <answer> tags")
     
     # Extract recommendation if present
-    recommendation_match = re.search(r'<recommendation>(.*?)</recommendation>', response.content, re.DOTALL)
+    recommendation_match = re.search(r'<recommendation>(.*?)</recommendation>', content, re.DOTALL)
     if recommendation_match:
         state["analysis"]["recommendation"] = recommendation_match.group(1).strip()
     
-    # Skip password extraction if NO_PASSWORD_FOUND in analysis
-    if "NO_PASSWORD_FOUND" in state["analysis"]["latest_response_analysis"]:
-        print("No password found in response, skipping password extraction")
-        state["analysis"]["latest_password_attempt"] = None
-        state["analysis"]["latest_guess_result"] = {"success": False, "message": "No password found in response"}
-        state["attempts"] += 1
-        
-        if state["attempts"] >= MAX_ATTEMPTS_PER_LEVEL:
-            print(f"Max attempts reached for current strategy.")
-            state["failed_strategies"] += 1
-            print(f"Strategy failed. Failed strategies: {state['failed_strategies']}/{MAX_STRATEGIES_PER_LEVEL}")
-            
-            if state["failed_strategies"] >= MAX_STRATEGIES_PER_LEVEL:
-                print("Max strategies tried, ending level.")
-                state["next_agent"] = END
-            else:
-                print("Changing strategy...")
-                state["attempts"] = 0
-                state["next_agent"] = "strategist"
-        else:
-            state["next_agent"] = "prompt_engineer"
-        return state
+    return "NO_PASSWORD_FOUND" not in state["analysis"]["latest_response_analysis"]
+
+def _summarize(state: GandalfState, latest_attempt: dict) -> None:
+    # Fold the newest attempt into the rolling summary before the defender can change
+    if HISTORY_SUMMARY_ENABLED:
+        update_summary(state["current_defender"], latest_attempt, state["analysis"])
+
+def _local_candidates(state: GandalfState, latest_attempt: dict) -> list:
+    """Run the deterministic extractor on the latest response and remember its candidates."""
+    if not LOCAL_EXTRACTOR_ENABLED:
+        return []
+    candidates = extract_candidates(latest_attempt["response"], latest_attempt["prompt"])
+    state["analysis"]["local_candidates"] = [c.model_dump() for c in candidates]
+    return candidates
+
+def _local_password(state: GandalfState, latest_attempt: dict) -> Optional[str]:
+    """Return a locally extracted password when it is confident enough to skip the LLM."""
+    candidates = _local_candidates(state, latest_attempt)
+    if candidates and candidates[0].confidence > LOCAL_EXTRACTOR_THRESHOLD:
+        best = candidates[0]
+        print(f"Local extractor found '{best.password}' ({best.source}, {best.confidence:.2f}), skipping LLM extraction")
+        print(f"\n🔑 Attempting password guess: '{best.password}'")
+        return best.password
+    return None
 
-    # For password extraction
-    messages_password = [
+def _apply_structured_analysis(state: GandalfState, result: ResponseAnalysis, latest_attempt: dict) -> Optional[str]:
+    """Store a structured analysis; return the most likely password, if any."""
+    candidates = list(result.candidates) if result.password_found else []
+    # Confident local decodes count even when the model missed the leak
+    known = {normalize_guess(c.password) for c in candidates}
+    candidates += [
+        PasswordCandidate(password=c.password, confidence=c.confidence)
+        for c in _local_candidates(state, latest_attempt)
+        if c.confidence > LOCAL_EXTRACTOR_THRESHOLD and normalize_guess(c.password) not in known
+    ]
+    candidates.sort(key=lambda c: c.confidence, reverse=True)
+    password = candidates[0].password.strip() if candidates else None
+
+    state["analysis"]["latest_response_analysis"] = password or "NO_PASSWORD_FOUND"
+    state["analysis"]["latest_reasoning"] = result.reasoning
+    state["analysis"]["password_candidates"] = [c.model_dump() for c in candidates]
+    if result.recommendation:
+        state["analysis"]["recommendation"] = result.recommendation
+
+    if password:
+        print(f"\n🔑 Attempting password guess: '{password}'")
+    return password
+
+def _repair_messages(raw, error: str) -> list:
+    """The invalid reply followed by the request to fix it."""
+    repair = get_analyzer_repair_message(error)
+    if raw is None or not (raw.content or raw.tool_calls):
+        return [repair]
+    if not raw.tool_calls:
+        return [raw, repair]
+    # Anthropic requires every tool_use block to be answered by a tool_result
+    return [raw] + [ToolMessage(content=repair.content, tool_call_id=call["id"], status="error") for call in raw.tool_calls]
+
+def _structured_output(output: dict, messages: list) -> tuple[Optional[ResponseAnalysis], list]:
+    """Unpack an include_raw structured reply; on failure return the repair conversation."""
+    record_usage("analyzer", output["raw"])
+    if output["parsed"] is not None:
+        return output["parsed"], messages
+    error = output["parsing_error"] or "No structured output was returned"
+    print(f"⚠️ Structured analysis failed validation: {error}")
+    return None, messages + _repair_messages(output["raw"], str(error))
+
+def _structured_llm():
+    # with_structured_output would bind the default model; resolve the run's configurable fields first
+    model = llm.prepare(ensure_config())[0] if isinstance(llm, DynamicRunnable) else llm
+    return model.with_structured_output(ResponseAnalysis, include_raw=True)
+
+def _analyze_structured(state: GandalfState, latest_attempt: dict) -> Optional[ResponseAnalysis]:
+    structured_llm = _structured_llm()
+    messages = _analysis_messages(state, latest_attempt, system=STRUCTURED_ANALYZER_SYSTEM)
+    for _ in range(ANALYZER_REPAIR_ATTEMPTS + 1):
+        result, messages = _structured_output(structured_llm.invoke(messages), messages)
+        if result is not None:
+            return result
+    return None
+
+async def _aanalyze_structured(state: GandalfState, latest_attempt: dict) -> Optional[ResponseAnalysis]:
+    structured_llm = _structured_llm()
+    messages = _analysis_messages(state, latest_attempt, system=STRUCTURED_ANALYZER_SYSTEM)
+    for _ in range(ANALYZER_REPAIR_ATTEMPTS + 1):
+        result, messages = _structured_output(await structured_llm.ainvoke(messages), messages)
+        if result is not None:
+            return result
+    return None
+
+def _handle_no_password(state: GandalfState, latest_attempt: dict) -> dict:
+    print("No password found in response, skipping password extraction")
+    state["analysis"]["latest_password_attempt"] = None
+    state["analysis"]["latest_guess_result"] = {"success": False, "message": "No password found in response"}
+    _summarize(state, latest_attempt)
+    schedule_next(state, latest_attempt)
+    enforce_budget(state)
+    return control_update(state)
+
+def _password_messages(state: GandalfState, latest_attempt: dict) -> list:
+    return [
         PASSWORD_EXTRACTOR_SYSTEM,
         get_password_extractor_human_message(
             response=latest_attempt['response'],
-            analysis=state["analysis"]["latest_response_analysis"]
+            analysis=state["analysis"]["latest_response_analysis"],
+            known_wrong=_known_wrong(state)
         )
     ]
+
+def _extract_password(content: str) -> str:
+    print("Password extraction response:", content)
     
-    password_response = llm.invoke(messages_password)
-    print("Password extraction response:", password_response.content)
-    
-    password_match = re.search(r'<answer>(.*?)</answer>', password_response.content, re.DOTALL)
+    password_match = re.search(r'<answer>(.*?)</answer>', content, re.DOTALL)
     if password_match:
         password = password_match.group(1).strip()
     else:
-        password = password_response.content.strip()
+        password = content.strip()
         print(f"Warning: Password response not properly formatted. Using entire response: {password}")
     
     # Try the password
     print(f"\n🔑 Attempting password guess: '{password}'")
-    guess_result = guess_password(
-        state["current_defender"],
-        password,
-        latest_attempt["prompt"],
-        latest_attempt["response"]
-    )
+    return password
+
+def _apply_guess_result(state: GandalfState, latest_attempt: dict, password: str, guess_result: dict, rejected: list) -> dict:
     print("\n📋 Guess result:")
     print("-" * 80)
     print(json.dumps(guess_result, indent=2))
@@ -114,20 +227,25 @@ def response_analyzer(state: GandalfState) -> GandalfState:
     # Update analysis
     state["analysis"]["latest_password_attempt"] = password
     state["analysis"]["latest_guess_result"] = guess_result
+    state["analysis"]["rejected_candidates"] = rejected
+    _summarize(state, latest_attempt)
     
     # After successful password guess, save to history
     if guess_result["success"]:
         print(f"Password guess successful! Moving to next level")
-        # Reset both counters on success
-        state["attempts"] = 0
-        state["failed_strategies"] = 0
+        # Reset the counters on success
+        start_level(state)
+        # The strategist fetched the defender info, so this normally comes from the cache
+        defender_info = peek_defender_info(state["current_defender"])
         save_completion_history(
             level=state["level"],
             defender=state["current_defender"],
             prompt=latest_attempt["prompt"],
             answer=latest_attempt["response"],
             password=password,
-            next_defender=guess_result.get("next_defender")
+            next_defender=guess_result.get("next_defender"),
+            strategy=state["analysis"].get("strategy"),
+            description=defender_info.description if defender_info else None
         )
 
         if guess_result.get("next_defender"):
@@ -139,28 +257,103 @@ def response_analyzer(state: GandalfState) -> GandalfState:
             print("No next defender, ending level")
             state["next_agent"] = END
     else:
-        state["attempts"] += 1
-        print(f"Password guess failed. Attempts: {state['attempts']}/{MAX_ATTEMPTS_PER_LEVEL}")
-        
-        if state["attempts"] >= MAX_ATTEMPTS_PER_LEVEL:
-            print(f"Max attempts reached for current strategy.")
-            
-            state["failed_strategies"] += 1
-            print(f"Strategy failed. Failed strategies: {state['failed_strategies']}/{MAX_STRATEGIES_PER_LEVEL}")
-            
-            # Use recommendation as failed strategy reason if available
-            if "recommendation" in state["analysis"]:
-                state["analysis"]["recommendation"] = state["analysis"]["recommendation"]
-
-            if state["failed_strategies"] >= MAX_STRATEGIES_PER_LEVEL:
-                print("Max strategies tried, ending level.")
-                state["next_agent"] = END
-            else:
-                print("Changing strategy...")
-                state["attempts"] = 0  # Reset attempts for new strategy
-                state["next_agent"] = "strategist"
-                print(f"Moving to next strategy. Strategy {state['failed_strategies'] + 1}/{MAX_STRATEGIES_PER_LEVEL}")
-        else:
-            state["next_agent"] = "prompt_engineer"
+        print(f"Password guess failed. Attempts with this strategy: {state['attempts'] + 1}")
+        schedule_next(state, latest_attempt, password)
     
-    return state 
\ No newline at end of file
+    enforce_budget(state)
+    return control_update(state)
+
+def _reset_candidates(state: GandalfState) -> None:
+    for key in ("password_candidates", "local_candidates", "rejected_candidates"):
+        state["analysis"].pop(key, None)
+
+def _ranked_guesses(state: GandalfState, password: str) -> list:
+    """The chosen password first, then the other model and local candidates, expanded with variants."""
+    candidates = [password]
+    # The analyzer's own answer, even when a local decode was confident enough to skip the extractor
+    answer = state["analysis"].get("latest_response_analysis") or ""
+    if "NO_PASSWORD_FOUND" not in answer:
+        candidates.append(answer)
+    candidates += [c["password"] for c in state["analysis"].get("password_candidates", [])]
+    candidates += [c["password"] for c in state["analysis"].get("local_candidates", [])]
+    guesses = expand_guesses(list(dict.fromkeys(candidates)), GUESS_MAX_CANDIDATES)
+    print(f"Verifying {len(guesses)} candidate guesses: {guesses}")
+    return guesses
+
+def _guess(state: GandalfState, latest_attempt: dict, password: str) -> dict:
+    password, guess_result, rejected = guess_candidates(
+        state["current_defender"],
+        _ranked_guesses(state, password),
+        latest_attempt["prompt"],
+        latest_attempt["response"]
+    )
+    return _apply_guess_result(state, latest_attempt, password, guess_result, rejected)
+
+async def _aguess(state: GandalfState, latest_attempt: dict, password: str) -> dict:
+    password, guess_result, rejected = await aguess_candidates(
+        state["current_defender"],
+        _ranked_guesses(state, password),
+        latest_attempt["prompt"],
+        latest_attempt["response"]
+    )
+    # The summary and history writes block on file locks; keep them off the event loop
+    return await asyncio.to_thread(_apply_guess_result, state, latest_attempt, password, guess_result, rejected)
+
+def _find_password(state: GandalfState, latest_attempt: dict) -> Optional[str]:
+    """Analyze the latest response; return the password to try, or None if nothing leaked."""
+    if ANALYZER_MODE == "structured":
+        result = _analyze_structured(state, latest_attempt)
+        if result is not None:
+            return _apply_structured_analysis(state, result, latest_attempt)
+        print("Falling back to two-step analysis")
+    
+    response = llm.invoke(_analysis_messages(state, latest_attempt))
+    record_usage("analyzer", response)
+    # Skip password extraction if NO_PASSWORD_FOUND in analysis
+    if not _apply_analysis(state, response.content):
+        return None
+
+    password = _local_password(state, latest_attempt)
+    if password is None:
+        password_response = llm.invoke(_password_messages(state, latest_attempt))
+        record_usage("password_extractor", password_response)
+        password = _extract_password(password_response.content)
+    return password
+
+async def _afind_password(state: GandalfState, latest_attempt: dict) -> Optional[str]:
+    """Async variant of _find_password."""
+    if ANALYZER_MODE == "structured":
+        result = await _aanalyze_structured(state, latest_attempt)
+        if result is not None:
+            return _apply_structured_analysis(state, result, latest_attempt)
+        print("Falling back to two-step analysis")
+    
+    response = await llm.ainvoke(_analysis_messages(state, latest_attempt))
+    record_usage("analyzer", response)
+    if not _apply_analysis(state, response.content):
+        return None
+
+    password = _local_password(state, latest_attempt)
+    if password is None:
+        password_response = await llm.ainvoke(_password_messages(state, latest_attempt))
+        record_usage("password_extractor", password_response)
+        password = _extract_password(password_response.content)
+    return password
+
+def response_analyzer(state: GandalfState) -> dict:
+    """Analyzes the response and extracts potential passwords."""
+    latest_attempt = state["latest_attempt"]
+    _reset_candidates(state)
+    password = _find_password(state, latest_attempt)
+    if password is None:
+        return _handle_no_password(state, latest_attempt)
+    return _guess(state, latest_attempt, password)
+
+async def aresponse_analyzer(state: GandalfState) -> dict:
+    """Async variant of response_analyzer."""
+    latest_attempt = state["latest_attempt"]
+    _reset_candidates(state)
+    password = await _afind_password(state, latest_attempt)
+    if password is None:
+        return await asyncio.to_thread(_handle_no_password, state, latest_attempt)
+    return await _aguess(state, latest_attempt, password)
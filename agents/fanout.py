@@ -0,0 +1,218 @@
+import asyncio
+import importlib
+import re
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from langchain_core.messages import AIMessage
+from langgraph.types import Send
+from core.state import GandalfState, control_update
+from core.usage import record_usage
+from core.api import send_message, asend_message
+from core.history import append_attempt, defender_attempts
+from core.similarity import PromptIndex, find_near_duplicate, similarity_stats
+from core.summary import update_summary
+from core.scheduler import attempt_reward, record_probe
+from core.guessing import guess_candidates, aguess_candidates
+from prompts.templates import get_prompt_batch_message
+from agents import analyzer
+from config.settings import PROMPT_FANOUT, PROMPT_SIMILARITY_THRESHOLD, HISTORY_SUMMARY_ENABLED
+
+# The package exports a prompt_engineer function that shadows the module name
+engineer = importlib.import_module("agents.prompt_engineer")
+
+# Batches with a successful guess; their remaining branches stop early
+_solved: Dict[str, threading.Event] = {}
+_tasks: Dict[str, Set[asyncio.Task]] = {}
+_lock = threading.Lock()
+
+# Probes that never reached the defender or finished because another branch won
+fanout_stats = {"batches": 0, "probes": 0, "cancelled": 0}
+
+def _extract_prompts(content: str) -> List[str]:
+    prompts = [p.strip() for p in re.findall(r'<answer>(.*?)</answer>', content, re.DOTALL) if p.strip()]
+    if not prompts:
+        raise ValueError("Prompts not properly formatted with <answer> tags")
+    return prompts
+
+def _select_prompts(state: GandalfState, prompts: List[str], count: int) -> List[str]:
+    """Drop prompts repeating an earlier attempt or another prompt of the batch."""
+    attempts = defender_attempts(state["current_defender"])
+    batch = PromptIndex()
+    selected = []
+    for prompt in prompts:
+        score, _ = batch.most_similar(prompt)
+        if score >= PROMPT_SIMILARITY_THRESHOLD:
+            similarity_stats["duplicates"] += 1
+            continue
+        if find_near_duplicate(state["current_defender"], attempts, prompt) is None:
+            batch.add(prompt)
+            selected.append(prompt)
+    # Never stall: with nothing new, send the model's first suggestion anyway
+    return selected[:count] or prompts[:1]
+
+def _start_batch(state: GandalfState, prompts: List[str]) -> dict:
+    batch = uuid.uuid4().hex
+    with _lock:
+        _solved[batch] = threading.Event()
+    fanout_stats["batches"] += 1
+    print(f"\n🔀 Probing {len(prompts)} prompts concurrently")
+    for prompt in prompts:
+        engineer._announce(prompt)
+    state["analysis"]["batch"] = batch
+    state["analysis"]["batch_prompts"] = prompts
+    state["next_agent"] = "probe"
+    return control_update(state, probes=[])
+
+def prompt_batch(state: GandalfState, count: int = PROMPT_FANOUT) -> dict:
+    """Generates several distinct prompts for the current strategy."""
+    messages = engineer._build_messages(state) + [get_prompt_batch_message(count)]
+    response = engineer.llm.invoke(messages)
+    record_usage("prompt_engineer", response)
+    return _start_batch(state, _select_prompts(state, _extract_prompts(response.content), count))
+
+async def aprompt_batch(state: GandalfState, count: int = PROMPT_FANOUT) -> dict:
+    """Async variant of prompt_batch."""
+    messages = engineer._build_messages(state) + [get_prompt_batch_message(count)]
+    response = await engineer.llm.ainvoke(messages)
+    record_usage("prompt_engineer", response)
+    return _start_batch(state, _select_prompts(state, _extract_prompts(response.content), count))
+
+def fan_out(state: GandalfState) -> List[Send]:
+    """Map each prompt of the batch onto its own probe branch."""
+    return [
+        Send("probe", {"state": state, "prompt": prompt, "batch": state["analysis"]["batch"], "index": index})
+        for index, prompt in enumerate(state["analysis"]["batch_prompts"])
+    ]
+
+def _is_solved(batch: str) -> bool:
+    with _lock:
+        event = _solved.get(batch)
+    return event is not None and event.is_set()
+
+def _mark_solved(batch: str) -> None:
+    with _lock:
+        _solved[batch].set()
+        tasks = list(_tasks.get(batch, ()))
+    current = asyncio.current_task() if _in_event_loop() else None
+    for task in tasks:
+        if task is not current:
+            task.cancel()
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+def _branch_state(state: GandalfState, attempt: dict) -> GandalfState:
+    """A private copy of the state for one branch, with its attempt as the latest."""
+    return {**state, "latest_attempt": attempt, "analysis": dict(state["analysis"])}
+
+def _new_attempt(prompt: str, message_response: dict) -> dict:
+    # Stored by collect_probes in branch order, so no branch sees a sibling's attempt
+    return {
+        "prompt": prompt,
+        "response": message_response["answer"],
+        "timestamp": datetime.now().isoformat()
+    }
+
+def _probe_result(index: int, attempt: dict, branch: GandalfState, password: Optional[str], guess: Optional[tuple]) -> dict:
+    guessed, guess_result, rejected = guess or (password, None, [])
+    return {
+        "index": index,
+        "attempt": attempt,
+        "analysis": branch["analysis"],
+        "password": guessed,
+        "guess_result": guess_result,
+        "rejected": rejected
+    }
+
+def _skipped(prompt: str) -> dict:
+    fanout_stats["cancelled"] += 1
+    return {"prompt": prompt, "skipped": True}
+
+def probe(payload: dict) -> dict:
+    """One branch: send a prompt, analyze the response and verify any password found."""
+    state, prompt, batch = payload["state"], payload["prompt"], payload["batch"]
+    fanout_stats["probes"] += 1
+    if _is_solved(batch):
+        return {"probes": [_skipped(prompt)]}
+    attempt = _new_attempt(prompt, send_message(state["current_defender"], prompt))
+    branch = _branch_state(state, attempt)
+    analyzer._reset_candidates(branch)
+    password = analyzer._find_password(branch, attempt) if not _is_solved(batch) else None
+    guess = None
+    if password is not None and not _is_solved(batch):
+        guess = guess_candidates(branch["current_defender"], analyzer._ranked_guesses(branch, password), prompt, attempt["response"])
+        if guess[1].get("success"):
+            _mark_solved(batch)
+    return {"probes": [_probe_result(payload["index"], attempt, branch, password, guess)]}
+
+async def _aprobe(state: GandalfState, prompt: str, batch: str, index: int) -> dict:
+    attempt = _new_attempt(prompt, await asend_message(state["current_defender"], prompt))
+    branch = _branch_state(state, attempt)
+    analyzer._reset_candidates(branch)
+    password = await analyzer._afind_password(branch, attempt)
+    guess = None
+    if password is not None:
+        guess = await aguess_candidates(branch["current_defender"], analyzer._ranked_guesses(branch, password), prompt, attempt["response"])
+        if guess[1].get("success"):
+            _mark_solved(batch)
+    return _probe_result(index, attempt, branch, password, guess)
+
+async def aprobe(payload: dict) -> dict:
+    """Async variant of probe; a winning branch cancels the others in flight."""
+    state, prompt, batch = payload["state"], payload["prompt"], payload["batch"]
+    fanout_stats["probes"] += 1
+    if _is_solved(batch):
+        return {"probes": [_skipped(prompt)]}
+    task = asyncio.ensure_future(_aprobe(state, prompt, batch, payload["index"]))
+    with _lock:
+        _tasks.setdefault(batch, set()).add(task)
+    try:
+        return {"probes": [await task]}
+    except asyncio.CancelledError:
+        if not task.cancelled():
+            raise
+        return {"probes": [_skipped(prompt)]}
+    finally:
+        with _lock:
+            _tasks.get(batch, set()).discard(task)
+
+def collect_probes(state: GandalfState) -> dict:
+    """Fold the branch results back into the state and decide what runs next."""
+    defender = state["current_defender"]
+    with _lock:
+        _solved.pop(state["analysis"].get("batch"), None)
+        _tasks.pop(state["analysis"].get("batch"), None)
+    # Branches finish in any order; fold them back in the order they were sent
+    probes = sorted((p for p in state["probes"] if not p.get("skipped")), key=lambda p: p["index"])
+    for result in probes:
+        append_attempt(defender, result["attempt"], level=state["level"], strategy=state["analysis"].get("strategy"))
+    messages = [AIMessage(content=result["attempt"]["response"]) for result in probes]
+    skipped = len(state["analysis"]["batch_prompts"]) - len(probes)
+    print(f"\n🔀 {len(probes)} probes finished" + (f", {skipped} cancelled after a success" if skipped else ""))
+
+    winner = next((p for p in probes if (p["guess_result"] or {}).get("success")), None)
+    chosen = winner or probes[-1]
+    # Every other branch is an attempt for the fixed counters; the bandits count the batch once
+    for result in probes:
+        if result is not chosen:
+            record_probe(state, attempt_reward(result["attempt"], result["analysis"], result["password"]))
+            if HISTORY_SUMMARY_ENABLED:
+                update_summary(defender, result["attempt"], result["analysis"])
+
+    # The scheduler's arms were counted above; the branch holds an older copy
+    state["analysis"].update({k: v for k, v in chosen["analysis"].items() if k != "arms"})
+    for key in ("batch", "batch_prompts"):
+        state["analysis"].pop(key, None)
+    state["latest_attempt"] = chosen["attempt"]
+    if chosen["guess_result"] is None:
+        update = analyzer._handle_no_password(state, chosen["attempt"])
+    else:
+        update = analyzer._apply_guess_result(state, chosen["attempt"], chosen["password"], chosen["guess_result"], chosen["rejected"])
+    return {**update, "messages": messages, "probes": []}
@@ -1,65 +1,138 @@
-import json
+import asyncio
 import re
 from datetime import datetime
-from langchain_anthropic import ChatAnthropic
+from typing import Optional
+from langchain_core.runnables import ConfigurableField
+from core.cassette import CassetteChatAnthropic
+from core.ratelimit import llm_rate_limiter
 from langchain_core.messages import AIMessage
-from core.state import GandalfState
-from core.api import send_message
-from core.history import save_attempt_history
-from prompts.templates import PROMPT_ENGINEER_SYSTEM, get_prompt_engineer_human_message
-from config.settings import LLM_MODEL, LLM_TEMPERATURE, ANTHROPIC_API_KEY
+from core.state import GandalfState, control_update
+from core.usage import record_usage
+from core.api import send_message, asend_message
+from core.history import append_attempt, defender_attempts
+from core.similarity import find_near_duplicate
+from prompts.templates import PROMPT_ENGINEER_SYSTEM, get_prompt_engineer_human_message, get_duplicate_prompt_message
+from prompts.context import build_attempts_context
+from core.summary import load_summary, render_summary
+from config.settings import (
+    LLM_MODEL,
+    LLM_TEMPERATURE,
+    ANTHROPIC_API_KEY,
+    PROMPT_ENGINEER_CONTEXT_TOKENS,
+    HISTORY_SUMMARY_ENABLED,
+    SUMMARY_RAW_ATTEMPTS,
+    PROMPT_REGENERATE_ATTEMPTS
+)
 
-llm = ChatAnthropic(
+llm = CassetteChatAnthropic(
     model=LLM_MODEL,
     temperature=LLM_TEMPERATURE,
-    anthropic_api_key=ANTHROPIC_API_KEY
-)
+    anthropic_api_key=ANTHROPIC_API_KEY,
+    rate_limiter=llm_rate_limiter
+).configurable_fields(temperature=ConfigurableField(id="temperature"))
 
-def prompt_engineer(state: GandalfState) -> GandalfState:
-    """Generates the actual prompt based on the strategy."""
-    messages = [
+def _build_messages(state: GandalfState) -> list:
+    # A mutation request from the scheduler applies to this prompt only
+    mutate_prompt = state['analysis'].pop('mutate_prompt', None) or ""
+    return [
         PROMPT_ENGINEER_SYSTEM,
         get_prompt_engineer_human_message(
             strategy=state['analysis']['strategy'],
-            history=json.dumps(state['history'].get(state['current_defender'], []), indent=2)
+            history=build_attempts_context(
+                defender_attempts(state['current_defender']),
+                PROMPT_ENGINEER_CONTEXT_TOKENS,
+                agent="prompt_engineer",
+                recent=SUMMARY_RAW_ATTEMPTS if HISTORY_SUMMARY_ENABLED else None
+            ),
+            history_summary=render_summary(load_summary(state['current_defender'])) if HISTORY_SUMMARY_ENABLED else "",
+            mutate_prompt=mutate_prompt
         )
     ]
-    
-    response = llm.invoke(messages)
-    
+
+def _extract_prompt(content: str) -> str:
     # Extract prompt from between answer tags
-    prompt_match = re.search(r'<answer>(.*?)</answer>', response.content, re.DOTALL)
+    prompt_match = re.search(r'<answer>(.*?)</answer>', content, re.DOTALL)
     if prompt_match:
         prompt = prompt_match.group(1).strip()
     else:
         raise ValueError("Prompt not properly formatted with <answer> tags")
-    
+    return prompt
+
+def _check_prompt(state: GandalfState, messages: list, content: str) -> tuple[str, Optional[list]]:
+    """Extract the prompt; if it repeats an earlier attempt, return the messages asking for a new one."""
+    prompt = _extract_prompt(content)
+    if PROMPT_REGENERATE_ATTEMPTS > 0:
+        attempts = defender_attempts(state["current_defender"])
+        duplicate = find_near_duplicate(state["current_defender"], attempts, prompt)
+        if duplicate is not None:
+            return prompt, messages + [AIMessage(content=content), get_duplicate_prompt_message(duplicate)]
+    return prompt, None
+
+def _announce(prompt: str) -> None:
     # Send the prompt to Gandalf
     print("\n📤 Sending prompt:")
     print("=" * 80)
     print(prompt)
     print("=" * 80)
-    
-    message_response = send_message(state["current_defender"], prompt)
+
+def _generate_prompt(state: GandalfState) -> str:
+    messages = _build_messages(state)
+    for _ in range(PROMPT_REGENERATE_ATTEMPTS + 1):
+        response = llm.invoke(messages)
+        record_usage("prompt_engineer", response)
+        prompt, retry_messages = _check_prompt(state, messages, response.content)
+        if retry_messages is None:
+            break
+        messages = retry_messages
+    _announce(prompt)
+    return prompt
+
+async def _agenerate_prompt(state: GandalfState) -> str:
+    messages = _build_messages(state)
+    for _ in range(PROMPT_REGENERATE_ATTEMPTS + 1):
+        response = await llm.ainvoke(messages)
+        record_usage("prompt_engineer", response)
+        prompt, retry_messages = _check_prompt(state, messages, response.content)
+        if retry_messages is None:
+            break
+        messages = retry_messages
+    _announce(prompt)
+    return prompt
+
+def _record_attempt(state: GandalfState, prompt: str, message_response: dict) -> dict:
     print("\n📥 Received response:")
     print("=" * 80)
     print(message_response["answer"])
     print("=" * 80)
     
-    # Store the attempt
-    if state["current_defender"] not in state["history"]:
-        state["history"][state["current_defender"]] = []
-    
-    state["history"][state["current_defender"]].append({
+    attempt = {
         "prompt": prompt,
         "response": message_response["answer"],
         "timestamp": datetime.now().isoformat()
-    })
+    }
     
-    # Save the updated history
-    save_attempt_history(state["history"])
+    # Persist the attempt; the state only keeps it as the latest one
+    append_attempt(
+        state["current_defender"],
+        attempt,
+        level=state["level"],
+        strategy=state["analysis"].get("strategy")
+    )
     
+    state["latest_attempt"] = attempt
     state["next_agent"] = "analyzer"
-    state["messages"].append(AIMessage(content=message_response["answer"]))
     
-    return state 
\ No newline at end of file
+    return control_update(state, messages=[AIMessage(content=message_response["answer"])])
+
+def prompt_engineer(state: GandalfState) -> dict:
+    """Generates the actual prompt based on the strategy."""
+    prompt = _generate_prompt(state)
+    message_response = send_message(state["current_defender"], prompt)
+    return _record_attempt(state, prompt, message_response)
+
+async def aprompt_engineer(state: GandalfState) -> dict:
+    """Async variant of prompt_engineer."""
+    prompt = await _agenerate_prompt(state)
+    message_response = await asend_message(state["current_defender"], prompt)
+    # Appending to the history store blocks; keep it off the event loop
+    return await asyncio.to_thread(_record_attempt, state, prompt, message_response)
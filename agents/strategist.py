@@ -1,43 +1,66 @@
 import json
 import re
-from langchain_anthropic import ChatAnthropic
-from core.state import GandalfState
-from core.api import get_defender_info
+from langchain_core.runnables import ConfigurableField
+from core.cassette import CassetteChatAnthropic
+from core.ratelimit import llm_rate_limiter
+from core.state import GandalfState, control_update
+from core.usage import record_usage
+from core.api import DefenderInfo
+from core.defenders import get_cached_defender_info, aget_cached_defender_info
+from core.history import defender_attempts
 from prompts.templates import STRATEGIST_SYSTEM, get_strategist_human_message
-from config.settings import LLM_MODEL, LLM_TEMPERATURE, ANTHROPIC_API_KEY
+from prompts.context import build_attempts_context
+from core.summary import load_summary, render_summary
+from core.library import similar_wins, render_wins
+from core.budget import track_level
+from config.settings import (
+    LLM_MODEL,
+    LLM_TEMPERATURE,
+    ANTHROPIC_API_KEY,
+    STRATEGIST_CONTEXT_TOKENS,
+    HISTORY_SUMMARY_ENABLED,
+    SUMMARY_RAW_ATTEMPTS,
+    STRATEGY_LIBRARY_ENABLED
+)
 
 
-llm = ChatAnthropic(
+# The temperature can be set per graph run with {"configurable": {"temperature": ...}}
+llm = CassetteChatAnthropic(
     model=LLM_MODEL,
     temperature=LLM_TEMPERATURE,
-    anthropic_api_key=ANTHROPIC_API_KEY
-)
+    anthropic_api_key=ANTHROPIC_API_KEY,
+    rate_limiter=llm_rate_limiter
+).configurable_fields(temperature=ConfigurableField(id="temperature"))
 
-def strategist_agent(state: GandalfState) -> GandalfState:
-    """Plans the overall approach and selects techniques based on level analysis."""
-    defender_info = get_defender_info(state["current_defender"])
+def _build_messages(state: GandalfState, defender_info: DefenderInfo) -> list:
+    # Add the most recent attempts that fit the budget to the prompt; with
+    # summaries enabled only the last few are sent raw
+    attempts_summary = build_attempts_context(
+        defender_attempts(state['current_defender']),
+        STRATEGIST_CONTEXT_TOKENS,
+        agent="strategist",
+        style="text",
+        recent=SUMMARY_RAW_ATTEMPTS if HISTORY_SUMMARY_ENABLED else None
+    )
+    history_summary = render_summary(load_summary(state['current_defender'])) if HISTORY_SUMMARY_ENABLED else ""
+    # Warm start from the winning strategies of the most similar earlier defenders
+    past_wins = render_wins(similar_wins(defender_info.description, state['current_defender'])) if STRATEGY_LIBRARY_ENABLED else ""
     
-    # Add previous attempts count and results to the prompt
-    current_attempts = state['history'].get(state['current_defender'], [])
-    attempts_summary = "\n".join([
-        f"Attempt {i+1}:\n- Prompt: {attempt['prompt']}\n- Response: {attempt['response']}"
-        for i, attempt in enumerate(current_attempts)
-    ])
-    
-    messages = [
+    return [
         STRATEGIST_SYSTEM,
         get_strategist_human_message(
             level_info=f"{defender_info.level} Info:\nDescription: {defender_info.description}",
             attempts_summary=attempts_summary,
-            previous_strategies=json.dumps(state['analysis'].get('previous_strategies', []), indent=2),
-            recommendation=state['analysis'].get('recommendation', 'No recommendation')
+            previous_strategies=json.dumps(state['analysis'].get('previous_strategies', [])),
+            recommendation=state['analysis'].get('recommendation', 'No recommendation'),
+            history_summary=history_summary,
+            past_wins=past_wins
         )
     ]
-    
-    response = llm.invoke(messages)
-    
+
+def _apply_strategy(state: GandalfState, content: str) -> dict:
     # Extract strategy from between answer tags
-    strategy = re.search(r'<answer>(.*?)</answer>', response.content, re.DOTALL)
+    strategy = re.search(r'<answer>(.*?)</answer>', content, re.DOTALL)
     if strategy:
         state["analysis"]["strategy"] = strategy.group(1).strip()
         # Add strategy printing
@@ -56,4 +79,20 @@ def strategist_agent(state: GandalfState) -> GandalfState:
     
     state["next_agent"] = "prompt_engineer"
     
-    return state 
\ No newline at end of file
+    return control_update(state)
+
+def strategist_agent(state: GandalfState) -> dict:
+    """Plans the overall approach and selects techniques based on level analysis."""
+    track_level(state["level"])
+    defender_info = get_cached_defender_info(state["current_defender"])
+    response = llm.invoke(_build_messages(state, defender_info))
+    record_usage("strategist", response)
+    return _apply_strategy(state, response.content)
+
+async def astrategist_agent(state: GandalfState) -> dict:
+    """Async variant of strategist_agent."""
+    track_level(state["level"])
+    defender_info = await aget_cached_defender_info(state["current_defender"])
+    response = await llm.ainvoke(_build_messages(state, defender_info))
+    record_usage("strategist", response)
+    return _apply_strategy(state, response.content)
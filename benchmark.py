@@ -0,0 +1,208 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from langgraph.graph import END
+import core.api
+import core.guessing
+import core.scheduler
+import agents.strategist
+from core.history import defender_attempts
+from core.usage import usage_stats
+from mock_gandalf.defenders import default_defenders
+from mock_gandalf.llm import ScriptedChatModel
+from mock_gandalf.server import start_mock_server
+import main
+
+# Lower is better for all of them; "solved" is checked separately
+METRICS = ["attempts", "llm_calls", "input_tokens", "output_tokens", "api_calls", "guess_calls", "wall_time"]
+# Reported but never gated: it moves with the machine's load far more than with the code
+REPORTED = {"wall_time"}
+# Metrics depending on thread timing, e.g. how many concurrent probes guess before
+# the first success stops the rest, with the absolute slack they get
+NOISY = {"guess_calls": 2}
+
+class LevelMeter:
+    """Snapshots the counters when a level starts and reports the deltas when it ends."""
+
+    def __init__(self, server):
+        self.server = server
+        self.levels: List[dict] = []
+        self.current: Optional[dict] = None
+
+    def _counters(self) -> Dict[str, float]:
+        with self.server.stats_lock:
+            guess_calls = self.server.stats["/api/guess-password"]
+            api_calls = sum(v for k, v in self.server.stats.items() if k.startswith("/api/")) - guess_calls
+        return {
+            "llm_calls": usage_stats["calls"],
+            "input_tokens": usage_stats["input_tokens"],
+            "output_tokens": usage_stats["output_tokens"],
+            "api_calls": api_calls,
+            "guess_calls": guess_calls,
+            "wall_time": time.perf_counter()
+        }
+
+    def start(self, level: int, defender: str) -> None:
+        self.current = {"level": level, "defender": defender, "start": self._counters()}
+
+    def finish(self, state: dict, solved: bool) -> None:
+        counters = self._counters()
+        start = self.current.pop("start")
+        self.current.update({key: counters[key] - start[key] for key in counters})
+        self.current["wall_time"] = round(self.current["wall_time"], 4)
+        self.current["attempts"] = len(defender_attempts(self.current["defender"]))
+        self.current["solved"] = solved
+        self.levels.append(self.current)
+        self.current = None
+
+    def observe(self, event: dict) -> bool:
+        """Track level changes in a streamed state; return True once the run is over."""
+        if self.current is None:
+            self.start(event["level"], event["current_defender"])
+        elif event["level"] != self.current["level"]:
+            self.finish(event, solved=True)
+            self.start(event["level"], event["current_defender"])
+        if event["next_agent"] == END:
+            solved = bool((event["analysis"].get("latest_guess_result") or {}).get("success"))
+            self.finish(event, solved)
+            return True
+        return False
+
+def _install_llm(llm) -> None:
+    for name in ("strategist", "prompt_engineer", "analyzer"):
+        sys.modules[f"agents.{name}"].llm = llm
+
+def _run(meter: LevelMeter, use_async: bool, fanout: int, max_steps: int) -> None:
+    config = {"configurable": {"thread_id": "bench"}, "recursion_limit": max_steps}
+    graph = main.build_gandalf_graph(use_async=use_async, fanout=fanout)
+    state = main.build_initial_state()
+    if use_async:
+        async def drive():
+            async for event in graph.astream(state, config=config, stream_mode="values"):
+                if meter.observe(event):
+                    break
+        asyncio.run(drive())
+    else:
+        for event in graph.stream(state, config=config, stream_mode="values"):
+            if meter.observe(event):
+                break
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    # Everything the solver persists is relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="gandalf-bench-"))
+    defenders = default_defenders(latency=args.api_latency)
+    defenders = {name: d for name, d in defenders.items() if d.level <= args.levels}
+    server = start_mock_server(defenders=defenders)
+    core.api.BASE_URL = server.base_url
+    if args.scheduler:
+        core.scheduler.SCHEDULER = args.scheduler
+    if args.cold_start:
+        agents.strategist.STRATEGY_LIBRARY_ENABLED = False
+    # Concurrent guesses race the first success, which makes guess_calls vary between runs
+    core.guessing.GUESS_FANOUT = args.guess_fanout
+    llm = ScriptedChatModel(latency=args.llm_latency, follow_strategy=args.follow_strategy)
+    _install_llm(llm)
+
+    meter = LevelMeter(server)
+    output = sys.stdout if args.verbose else io.StringIO()
+    with contextlib.redirect_stdout(output):
+        _run(meter, args.use_async, args.fanout, args.max_steps)
+    server.shutdown()
+
+    totals = {metric: round(sum(level[metric] for level in meter.levels), 4) for metric in METRICS}
+    totals["solved"] = sum(level["solved"] for level in meter.levels)
+    totals["median_attempts"] = statistics.median(level["attempts"] for level in meter.levels if level["solved"]) if totals["solved"] else None
+    mode = ("async" if args.use_async else "sync") + (f"-fanout{args.fanout}" if args.fanout > 1 else "")
+    mode += f"-guess-fanout{args.guess_fanout}" if args.guess_fanout > 1 else "" + ("-follow-strategy" if args.follow_strategy else "") + ("-cold-start" if args.cold_start else "")
+    return {
+        "mode": mode,
+        "scheduler": core.scheduler.SCHEDULER,
+        "cache_marked": sorted(llm.cache_marked),
+        "levels": meter.levels,
+        "totals": totals
+    }
+
+def compare(result: dict, baseline: dict, tolerance: float, noise_tolerance: float) -> List[str]:
+    """List the metrics that got worse than the baseline beyond the tolerances.
+
+    A baseline saved with --tolerance keeps it, so the runs it gates need no flag.
+    """
+    tolerance = max(tolerance, baseline.get("tolerance", 0.0))
+    if result["mode"] != baseline["mode"]:
+        return [f"baseline was measured in {baseline['mode']} mode, not {result['mode']}"]
+    regressions = []
+    if result["totals"]["solved"] < baseline["totals"]["solved"]:
+        regressions.append(f"solved levels: {result['totals']['solved']} < {baseline['totals']['solved']}")
+    # The system prompts must still reach the model as prompt-cache breakpoints
+    if "cache_marked" in baseline and result["cache_marked"] != baseline["cache_marked"]:
+        regressions.append(f"prompt-cache breakpoints: {result['cache_marked']} != {baseline['cache_marked']}")
+    base_levels = {level["level"]: level for level in baseline["levels"]}
+    rows = [("total", result["totals"], baseline["totals"])]
+    rows += [(f"level {l['level']}", l, base_levels[l["level"]]) for l in result["levels"] if l["level"] in base_levels]
+    for label, current, base in rows:
+        for metric in (m for m in METRICS if m not in REPORTED):
+            allowed = base[metric] * (1 + (noise_tolerance if metric in NOISY else tolerance))
+            if current[metric] > allowed and current[metric] - base[metric] > NOISY.get(metric, 0):
+                regressions.append(f"{label} {metric}: {current[metric]} > {base[metric]}")
+    return regressions
+
+def _print_table(result: dict) -> None:
+    print(f"{'level':<6}{'defender':<26}{'solved':<8}" + "".join(f"{m:>14}" for m in METRICS))
+    for level in result["levels"]:
+        print(f"{level['level']:<6}{level['defender']:<26}{str(level['solved']):<8}" + "".join(f"{level[m]:>14}" for m in METRICS))
+    totals = result["totals"]
+    print(f"{'total':<32}{totals['solved']:<8}" + "".join(f"{totals[m]:>14}" for m in METRICS))
+    print(f"\n{result['scheduler']} scheduler, median attempts per solved level: {totals['median_attempts']}")
+    print(f"Prompt-cache breakpoints seen by the LLM: {', '.join(result['cache_marked']) or 'none'}")
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline solver benchmark against the mock Gandalf API")
+    parser.add_argument("--levels", type=int, default=8, help="number of mock levels to play")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="run the async graph")
+    parser.add_argument("--fanout", type=int, default=1, help="prompts probed concurrently per step")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="seconds the mock defenders take per call")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds the scripted LLM takes per call")
+    parser.add_argument("--guess-fanout", type=int, default=1,
+                        help="guesses verified concurrently (default 1, so guess calls are repeatable)")
+    parser.add_argument("--scheduler", default=None, help="attempt scheduler (default: SCHEDULER from the settings)")
+    parser.add_argument("--follow-strategy", action="store_true",
+                        help="script the strategist and prompt engineer to follow distinct strategies")
+    parser.add_argument("--cold-start", action="store_true", help="plan every level without the strategy library")
+    parser.add_argument("--max-steps", type=int, default=500, help="graph recursion limit")
+    parser.add_argument("--output", metavar="PATH", help="write the results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="fail if results regress against this JSON")
+    parser.add_argument("--save-baseline", metavar="PATH", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.0, help="allowed relative increase of counted metrics")
+    parser.add_argument("--noise-tolerance", type=float, default=0.5,
+                        help="allowed relative increase of guess calls made by concurrent fan-out probes")
+    parser.add_argument("--verbose", action="store_true", help="show the solver output")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    paths = {name: os.path.abspath(getattr(args, name)) for name in ("output", "baseline", "save_baseline") if getattr(args, name)}
+
+    result = run_benchmark(args)
+    _print_table(result)
+    for name in ("output", "save_baseline"):
+        if name in paths:
+            with open(paths[name], "w") as f:
+                json.dump({**result, "tolerance": args.tolerance} if name == "save_baseline" and args.tolerance else result, f, indent=2)
+    if "baseline" in paths:
+        with open(paths["baseline"], "r") as f:
+            regressions = compare(result, json.load(f), args.tolerance, args.noise_tolerance)
+        if regressions:
+            print("\n❌ Regressions against the baseline:")
+            for regression in regressions:
+                print(f"- {regression}")
+            sys.exit(1)
+        print("\n✅ No regressions against the baseline")
@@ -0,0 +1,155 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from langgraph.graph import END
+import core.api
+from core.defenders import aget_cached_defender_info
+from core.ratelimit import api_rate_limiter, llm_rate_limiter
+from core.transport import aclose_async_client
+from core.usage import usage_stats
+from core.budget import reset_budget
+from main import build_gandalf_graph, build_initial_state
+from config.settings import (
+    KNOWN_DEFENDERS,
+    CAMPAIGN_CONCURRENCY,
+    API_RATE_LIMIT,
+    LLM_RATE_LIMIT,
+    PROMPT_FANOUT
+)
+
+def _log(message: str) -> None:
+    # Campaign progress goes to the terminal even when the solver output is silenced
+    print(message, file=sys.__stdout__, flush=True)
+
+async def _level(defender: str) -> int:
+    if defender in KNOWN_DEFENDERS:
+        return KNOWN_DEFENDERS.index(defender) + 1
+    return (await aget_cached_defender_info(defender)).level
+
+async def plan_sessions(defenders: List[str], temperatures: List[Optional[float]], seeds: int) -> List[dict]:
+    """One session per defender, temperature and seed, each with its own thread id."""
+    sessions = []
+    for defender in defenders:
+        level = await _level(defender)
+        for temperature in temperatures:
+            for seed in range(seeds):
+                label = f"{defender}-t{temperature if temperature is not None else 'default'}-s{seed}"
+                sessions.append({
+                    "thread_id": label,
+                    "defender": defender,
+                    "level": level,
+                    "temperature": temperature,
+                    "seed": seed
+                })
+    return sessions
+
+async def run_session(graph, session: dict, semaphore: asyncio.Semaphore, play_on: bool, max_steps: int) -> dict:
+    """Run one solver session; without play_on it ends once its starting level is solved."""
+    async with semaphore:
+        configurable = {"thread_id": session["thread_id"]}
+        if session["temperature"] is not None:
+            configurable["temperature"] = session["temperature"]
+        config = {"configurable": configurable, "recursion_limit": max_steps}
+        state = build_initial_state(session["defender"], session["level"])
+        # Session labels repeat across campaigns; start from an empty thread
+        await graph.checkpointer.adelete_thread(session["thread_id"])
+        reset_budget(session["thread_id"])
+        _log(f"▶️ {session['thread_id']} started")
+        started = time.perf_counter()
+        result = {**session, "outcome": "failed", "levels_solved": 0}
+        try:
+            async for event in graph.astream(state, config=config, stream_mode="values"):
+                result["levels_solved"] = event["level"] - session["level"]
+                if result["levels_solved"] and not play_on:
+                    result["outcome"] = "solved"
+                    break
+                if event["next_agent"] == END:
+                    if (event["analysis"].get("latest_guess_result") or {}).get("success"):
+                        result["levels_solved"] += 1
+                    if result["levels_solved"]:
+                        result["outcome"] = "solved"
+                    else:
+                        result["outcome"] = "budget" if event["analysis"].get("budget_exceeded") else "failed"
+                    break
+        finally:
+            # Also when a sibling's success cancels the session
+            reset_budget(session["thread_id"])
+        result["seconds"] = round(time.perf_counter() - started, 2)
+        return result
+
+async def run_campaign(sessions: List[dict], concurrency: int, fanout: int, play_on: bool, max_steps: int) -> List[dict]:
+    """Run the sessions concurrently; the first to solve a defender cancels its siblings."""
+    graph = build_gandalf_graph(use_async=True, fanout=fanout)
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks: Dict[str, List[asyncio.Task]] = defaultdict(list)
+    results = []
+
+    async def run(session: dict) -> None:
+        try:
+            result = await run_session(graph, session, semaphore, play_on, max_steps)
+        except asyncio.CancelledError:
+            result = {**session, "outcome": "cancelled", "levels_solved": 0, "seconds": None}
+        results.append(result)
+        _log(f"⏹️ {session['thread_id']} {result['outcome']}")
+        if result["outcome"] == "solved" and not play_on:
+            for sibling in tasks[session["defender"]]:
+                if sibling is not asyncio.current_task():
+                    sibling.cancel()
+
+    for session in sessions:
+        tasks[session["defender"]].append(asyncio.ensure_future(run(session)))
+    try:
+        await asyncio.gather(*(task for group in tasks.values() for task in group), return_exceptions=True)
+    finally:
+        await aclose_async_client()
+    return results
+
+def _print_results(results: List[dict], elapsed: float) -> None:
+    _log(f"\n{'session':<48}{'outcome':<11}{'levels':>7}{'seconds':>9}")
+    for result in sorted(results, key=lambda r: r["thread_id"]):
+        seconds = "-" if result["seconds"] is None else result["seconds"]
+        _log(f"{result['thread_id']:<48}{result['outcome']:<11}{result['levels_solved']:>7}{seconds:>9}")
+    _log(f"\n{len(results)} sessions in {elapsed:.1f}s, {usage_stats['calls']} LLM calls, "
+         f"{usage_stats['input_tokens']} input / {usage_stats['output_tokens']} output tokens")
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run many Gandalf solver sessions concurrently")
+    parser.add_argument("defenders", nargs="*", default=KNOWN_DEFENDERS,
+                        help="defenders to attack (default: all known defenders)")
+    parser.add_argument("--temperatures", default=None,
+                        help="comma separated temperatures; one session per temperature")
+    parser.add_argument("--seeds", type=int, default=1, help="sessions per defender and temperature")
+    parser.add_argument("--concurrency", type=int, default=CAMPAIGN_CONCURRENCY, help="sessions running at once")
+    parser.add_argument("--rate", type=float, default=API_RATE_LIMIT, help="Gandalf API requests per second")
+    parser.add_argument("--llm-rate", type=float, default=LLM_RATE_LIMIT, help="LLM requests per second")
+    parser.add_argument("--fanout", type=int, default=PROMPT_FANOUT, help="prompts probed concurrently per step")
+    parser.add_argument("--play-on", action="store_true",
+                        help="keep playing the following levels instead of stopping after the first")
+    parser.add_argument("--max-steps", type=int, default=500, help="graph recursion limit per session")
+    parser.add_argument("--api-url", default=None, metavar="URL", help="Gandalf API base URL")
+    parser.add_argument("--quiet", action="store_true", help="hide the solver output of the sessions")
+    return parser.parse_args()
+
+async def _main(args: argparse.Namespace) -> List[dict]:
+    temperatures = [float(t) for t in args.temperatures.split(",")] if args.temperatures else [None]
+    sessions = await plan_sessions(args.defenders, temperatures, args.seeds)
+    _log(f"🚩 Campaign of {len(sessions)} sessions, {args.concurrency} at a time")
+    return await run_campaign(sessions, args.concurrency, args.fanout, args.play_on, args.max_steps)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.api_url:
+        core.api.BASE_URL = args.api_url.rstrip("/")
+    api_rate_limiter.set_rate(args.rate)
+    llm_rate_limiter.set_rate(args.llm_rate)
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()) if args.quiet else contextlib.nullcontext():
+        results = asyncio.run(_main(args))
+    _print_results(results, time.perf_counter() - started)
@@ -7,14 +7,116 @@ load_dotenv()
 
 # Graph configuration
 GRAPH_CONFIG = {"configurable": {"thread_id": "1"}}
+STATE_MAX_MESSAGES = 0  # Defender responses kept in the state's messages channel; 0 disables it
 
 # Constants
 MAX_ATTEMPTS_PER_LEVEL = 3
 MAX_STRATEGIES_PER_LEVEL = 2  # Maximum number of strategies to try per level
 
+# Attempt scheduling
+SCHEDULER = "ucb"  # "ucb" or "thompson" bandit over the level's strategies, or "fixed" (the two limits above)
+LEVEL_ATTEMPT_BUDGET = MAX_ATTEMPTS_PER_LEVEL * MAX_STRATEGIES_PER_LEVEL  # Attempts per level under the bandit schedulers
+SCHEDULER_UCB_EXPLORATION = 0.5  # Weight of the UCB exploration bonus
+
+# Strategy library: wins on earlier levels shown to the strategist
+STRATEGY_LIBRARY_ENABLED = True
+STRATEGY_LIBRARY_TOP_K = 3  # Most similar past wins in each strategist prompt
+STRATEGY_LIBRARY_MIN_SIMILARITY = 0.0  # Cosine similarity below which a past win is left out
+
+# Budget governor: limits per run (graph thread) and per level, 0 disables a limit.
+# Checked after every analyzed attempt; a spent budget ends the run through END
+BUDGET_RUN_LIMITS = {"input_tokens": 0, "output_tokens": 0, "cost": 0, "api_calls": 0, "seconds": 0}
+BUDGET_LEVEL_LIMITS = {"input_tokens": 0, "output_tokens": 0, "cost": 0, "api_calls": 0, "seconds": 0}
+BUDGET_DOWNGRADE_AT = 0.8  # Fraction of any limit after which the attempt-history context is shrunk
+BUDGET_DOWNGRADE_CONTEXT_SCALE = 0.5  # Factor applied to the *_CONTEXT_TOKENS budgets once downgraded
+# Prices in dollars per million tokens, for the cost estimate
+LLM_INPUT_COST_PER_MTOK = 3.0
+LLM_OUTPUT_COST_PER_MTOK = 15.0
+LLM_CACHE_READ_COST_PER_MTOK = 0.3
+LLM_CACHE_WRITE_COST_PER_MTOK = 3.75
+
 # LLM Configuration
 LLM_MODEL = "claude-3-5-sonnet-20241022"
 LLM_TEMPERATURE = 0.7
+PROMPT_CACHING_ENABLED = True  # Mark the large static system prompts as Anthropic prompt-cache breakpoints
+PROMPT_CACHE_MIN_TOKENS = 1024  # Anthropic does not cache shorter prompts, so they are left unmarked
+
+# Analyzer
+ANALYZER_MODE = "two_step"  # "two_step" (analyze, then extract) or "structured" (single schema-validated call)
+ANALYZER_REPAIR_ATTEMPTS = 1  # Re-asks after a structured reply fails validation
+LOCAL_EXTRACTOR_ENABLED = True  # Decode common leak formats locally before asking the LLM
+LOCAL_EXTRACTOR_THRESHOLD = 0.8  # Local confidence above which the password-extractor LLM call is skipped
+GUESS_MAX_CANDIDATES = 8  # Password guesses (candidates plus variants) verified per analysis
+GUESS_FANOUT = 4  # Guesses verified concurrently
+
+# Prompt context budgets (estimated tokens of attempt history per agent call)
+STRATEGIST_CONTEXT_TOKENS = 4000
+PROMPT_ENGINEER_CONTEXT_TOKENS = 3000
+ANALYZER_CONTEXT_TOKENS = 1500
+CONTEXT_MAX_RESPONSE_CHARS = 600  # Longer defender responses are truncated in context
+CONTEXT_CHARS_PER_TOKEN = 4  # Heuristic used to estimate tokens
+
+# Rolling per-defender summaries replace the full history in strategist/prompt engineer calls
+HISTORY_SUMMARY_ENABLED = True
+SUMMARY_RAW_ATTEMPTS = 3  # Most recent raw attempts sent alongside the summary
+SUMMARY_MAX_ITEMS = 10  # Entries kept in each summary list
+
+# Near-duplicate prompt detection
+PROMPT_SIMILARITY_THRESHOLD = 0.8  # Estimated Jaccard similarity at which a prompt counts as a repeat
+PROMPT_REGENERATE_ATTEMPTS = 2  # Regenerations before a near-duplicate is sent anyway (0 disables the check)
+
+# Parallel prompt fan-out
+PROMPT_FANOUT = 1  # Prompts generated per step and probed concurrently; 1 keeps the sequential graph
+
+# Defender response cache
+RESPONSE_CACHE_ENABLED = True  # Answer repeated prompts from the recorded history instead of the API
+RESPONSE_CACHE_BYPASS_DEFENDERS = []  # Defenders whose answers vary too much to be replayed
+
+# Gandalf API transport
+API_CONNECT_TIMEOUT = 5.0  # Seconds to establish a connection
+API_READ_TIMEOUT = 60.0  # Seconds to wait for the defender to answer
+API_MAX_RETRIES = 5  # Retries on connection errors and retryable status codes
+API_RETRY_STATUSES = (429, 500, 502, 503, 504)
+API_BACKOFF_BASE = 0.5  # Seconds, doubled on every retry
+API_BACKOFF_MAX = 30.0  # Upper bound for a single backoff sleep
+API_POOL_SIZE = 10  # Keep-alive connections kept per host
+API_MAX_CONCURRENCY_PER_HOST = 4  # Simultaneous in-flight requests per host
+
+# Attempts history
+HISTORY_BACKEND = "sqlite"  # "sqlite" (history.db) or "json" (attempts_history.json + append log)
+ATTEMPTS_COMPACT_EVERY = 500  # Appended attempts before the log is folded into attempts_history.json
+
+# Defender info cache
+DEFENDER_CACHE_TTL = 24 * 60 * 60  # Seconds before a cached description is re-fetched
+DEFENDER_CACHE_SIZE = 32  # Entries kept in the in-memory LRU
+PREFETCH_DEFENDERS = False  # Load every known defender's info at startup
+KNOWN_DEFENDERS = [
+    "baseline",
+    "do-not-tell",
+    "do-not-tell-and-block",
+    "gpt-is-password-encoded",
+    "word-blacklist",
+    "gpt-blacklist",
+    "gandalf",
+    "gandalf-the-white"
+]
+
+# Campaign runner; the rate limits are shared by every session in the process
+CAMPAIGN_CONCURRENCY = 4  # Solver sessions running at once
+API_RATE_LIMIT = None  # Gandalf API requests per second, None for no limit
+LLM_RATE_LIMIT = None  # LLM requests per second, None for no limit
+
+# Graph checkpoints
+CHECKPOINT_BACKEND = "sqlite"  # "sqlite" (checkpoints.db, resumable with --resume) or "memory"
+CHECKPOINT_FILE = "checkpoints.db"
+CHECKPOINT_RETENTION = 20  # Newest checkpoints kept per thread; older ones are pruned after every step
+
+# Record/replay of defender API and LLM calls
+CASSETTE_MODE = None  # None for live calls, "record" or "replay"
+CASSETTE_FILE = "cassette.jsonl"  # Replay needs the same history files the recording started from
+
+# Gandalf API; point at a local mock_gandalf server for offline runs
+GANDALF_API_URL = os.getenv("GANDALF_API_URL", "https://gandalf.lakera.ai/api").rstrip("/")
 
 # API Keys
-ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY") 
\ No newline at end of file
+ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
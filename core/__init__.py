@@ -1,20 +1,66 @@
 from .state import GandalfState
-from .api import get_defender_info, send_message, guess_password, DefenderInfo
+from .usage import record_usage, usage_stats
+from .api import (
+    get_defender_info,
+    send_message,
+    guess_password,
+    aget_defender_info,
+    asend_message,
+    aguess_password,
+    DefenderInfo
+)
+from .defenders import (
+    get_cached_defender_info,
+    aget_cached_defender_info,
+    invalidate_defender_info,
+    prefetch_defender_info,
+    peek_defender_info
+)
 from .history import (
     save_attempt_history,
+    append_attempt,
+    compact_attempt_history,
     load_attempt_history,
+    load_defender_attempts,
+    defender_attempts,
+    last_attempts,
+    attempts_with_strategy,
+    successful_entries,
+    get_history_store,
+    load_rejected_guesses,
+    add_rejected_guesses,
     save_completion_history,
     get_current_level_info
 )
 
 __all__ = [
     'GandalfState',
+    'record_usage',
+    'usage_stats',
     'get_defender_info',
     'send_message',
     'guess_password',
+    'aget_defender_info',
+    'asend_message',
+    'aguess_password',
     'DefenderInfo',
+    'get_cached_defender_info',
+    'aget_cached_defender_info',
+    'invalidate_defender_info',
+    'prefetch_defender_info',
+    'peek_defender_info',
     'save_attempt_history',
+    'append_attempt',
+    'compact_attempt_history',
     'load_attempt_history',
+    'load_defender_attempts',
+    'defender_attempts',
+    'last_attempts',
+    'attempts_with_strategy',
+    'successful_entries',
+    'get_history_store',
+    'load_rejected_guesses',
+    'add_rejected_guesses',
     'save_completion_history',
     'get_current_level_info'
 ] 
\ No newline at end of file
@@ -1,37 +1,115 @@
-import requests
+from typing import Optional
 from pydantic import BaseModel
+from core.transport import request, arequest
+from core.history import find_cached_response
+from core import cassette
+from core.budget import charge_api_call
+from config.settings import RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_BYPASS_DEFENDERS, GANDALF_API_URL
 
-BASE_URL = 'https://gandalf.lakera.ai/api'
+BASE_URL = GANDALF_API_URL
+
+# Defender calls answered from the history instead of the network
+response_cache_stats = {"hits": 0, "misses": 0}
 
 class DefenderInfo(BaseModel):
     description: str
     level: int
     name: str
 
-def get_defender_info(defender: str) -> DefenderInfo:
-    """Get information about a specific defender."""
-    response = requests.get(f"{BASE_URL}/defender?defender={defender}")
-    data = response.json()
-    
+def _parse_defender_info(data: dict) -> DefenderInfo:
     if "error" in data:
         raise ValueError(f"API Error: {data['error']}")
         
     return DefenderInfo(**data)
 
-def send_message(defender: str, prompt: str) -> dict:
-    """Send a message to the defender and get the response."""
-    data = {'defender': defender, 'prompt': prompt}
-    response = requests.post(f"{BASE_URL}/send-message", data=data)
-    return response.json()
-
-def guess_password(defender: str, password: str, prompt: str, answer: str) -> dict:
-    """Attempt to guess the password for the current level."""
-    data = {
+def _guess_payload(defender: str, password: str, prompt: str, answer: str) -> dict:
+    return {
         'defender': defender,
         'password': password,
         'prompt': prompt,
         'answer': answer,
         'trial_levels': 'false'
     }
-    response = requests.post(f"{BASE_URL}/guess-password", data=data)
-    return response.json() 
\ No newline at end of file
+
+def _cached_answer(defender: str, prompt: str, use_cache: bool) -> Optional[dict]:
+    if not (use_cache and RESPONSE_CACHE_ENABLED) or defender in RESPONSE_CACHE_BYPASS_DEFENDERS:
+        return None
+    answer = find_cached_response(defender, prompt)
+    if answer is None:
+        response_cache_stats["misses"] += 1
+        return None
+    response_cache_stats["hits"] += 1
+    print(f"📦 Answering from history cache ({response_cache_stats['hits']} defender calls saved)")
+    return {"answer": answer, "defender": defender, "prompt": prompt, "cached": True}
+
+def _http_key(method: str, url: str, kwargs: dict) -> str:
+    return cassette.cassette_key("http", {
+        "method": method,
+        "path": url[len(BASE_URL):] if url.startswith(BASE_URL) else url,
+        "params": kwargs.get("params"),
+        "data": kwargs.get("data")
+    })
+
+def _request_json(method: str, url: str, **kwargs) -> dict:
+    """Make a request and decode its JSON body, going through the cassette when one is active."""
+    charge_api_call()
+    mode = cassette.cassette_mode()
+    if mode == "replay":
+        return cassette.replay(_http_key(method, url, kwargs))
+    data = request(method, url, **kwargs).json()
+    if mode == "record":
+        cassette.record(_http_key(method, url, kwargs), data)
+    return data
+
+async def _arequest_json(method: str, url: str, **kwargs) -> dict:
+    """Async variant of _request_json."""
+    charge_api_call()
+    mode = cassette.cassette_mode()
+    if mode == "replay":
+        return cassette.replay(_http_key(method, url, kwargs))
+    response = await arequest(method, url, **kwargs)
+    data = response.json()
+    if mode == "record":
+        cassette.record(_http_key(method, url, kwargs), data)
+    return data
+
+def guess_was_recorded(defender: str, password: str, prompt: str, answer: str) -> bool:
+    """False for a guess a replayed cassette never saw, e.g. one cancelled after another guess won."""
+    if cassette.cassette_mode() != "replay":
+        return True
+    data = _guess_payload(defender, password, prompt, answer)
+    return cassette.has_recording(_http_key("POST", f"{BASE_URL}/guess-password", {"data": data}))
+
+def get_defender_info(defender: str) -> DefenderInfo:
+    """Get information about a specific defender."""
+    return _parse_defender_info(_request_json("GET", f"{BASE_URL}/defender", params={'defender': defender}))
+
+def send_message(defender: str, prompt: str, use_cache: bool = True) -> dict:
+    """Send a message to the defender and get the response."""
+    cached = _cached_answer(defender, prompt, use_cache)
+    if cached is not None:
+        return cached
+    data = {'defender': defender, 'prompt': prompt}
+    return _request_json("POST", f"{BASE_URL}/send-message", data=data)
+
+def guess_password(defender: str, password: str, prompt: str, answer: str) -> dict:
+    """Attempt to guess the password for the current level."""
+    data = _guess_payload(defender, password, prompt, answer)
+    return _request_json("POST", f"{BASE_URL}/guess-password", data=data)
+
+async def aget_defender_info(defender: str) -> DefenderInfo:
+    """Async variant of get_defender_info."""
+    return _parse_defender_info(await _arequest_json("GET", f"{BASE_URL}/defender", params={'defender': defender}))
+
+async def asend_message(defender: str, prompt: str, use_cache: bool = True) -> dict:
+    """Async variant of send_message."""
+    cached = _cached_answer(defender, prompt, use_cache)
+    if cached is not None:
+        return cached
+    data = {'defender': defender, 'prompt': prompt}
+    return await _arequest_json("POST", f"{BASE_URL}/send-message", data=data)
+
+async def aguess_password(defender: str, password: str, prompt: str, answer: str) -> dict:
+    """Async variant of guess_password."""
+    data = _guess_payload(defender, password, prompt, answer)
+    return await _arequest_json("POST", f"{BASE_URL}/guess-password", data=data)
@@ -0,0 +1,191 @@
+import threading
+import time
+from typing import Dict, Optional
+
+from langgraph.config import get_config
+from langgraph.graph import END
+from config.settings import (
+    BUDGET_RUN_LIMITS,
+    BUDGET_LEVEL_LIMITS,
+    BUDGET_DOWNGRADE_AT,
+    BUDGET_DOWNGRADE_CONTEXT_SCALE,
+    LLM_INPUT_COST_PER_MTOK,
+    LLM_OUTPUT_COST_PER_MTOK,
+    LLM_CACHE_READ_COST_PER_MTOK,
+    LLM_CACHE_WRITE_COST_PER_MTOK
+)
+
+LIMIT_LABELS = {
+    "input_tokens": "input tokens",
+    "output_tokens": "output tokens",
+    "cost": "estimated cost ($)",
+    "api_calls": "defender API calls",
+    "seconds": "seconds"
+}
+
+def estimate_cost(usage: Dict[str, int]) -> float:
+    """Dollar cost of one LLM call from its record_usage counts; input_tokens includes cached tokens."""
+    uncached = usage["input_tokens"] - usage["cache_read_tokens"] - usage["cache_creation_tokens"]
+    return (
+        max(uncached, 0) * LLM_INPUT_COST_PER_MTOK
+        + usage["cache_read_tokens"] * LLM_CACHE_READ_COST_PER_MTOK
+        + usage["cache_creation_tokens"] * LLM_CACHE_WRITE_COST_PER_MTOK
+        + usage["output_tokens"] * LLM_OUTPUT_COST_PER_MTOK
+    ) / 1_000_000
+
+def _counters() -> dict:
+    return {"input_tokens": 0, "output_tokens": 0, "cost": 0.0, "api_calls": 0, "started": time.monotonic()}
+
+def _spent(counters: dict, key: str) -> float:
+    return time.monotonic() - counters["started"] if key == "seconds" else counters[key]
+
+def _saved(counters: dict) -> dict:
+    return {key: _spent(counters, key) for key in LIMIT_LABELS}
+
+def _over(counters: dict, limits: Dict[str, float], fraction: float = 1.0) -> Optional[str]:
+    # The first limit spent up to the fraction, described for the log; 0 or None disables a limit
+    for key, limit in limits.items():
+        spent = _spent(counters, key)
+        if limit and spent >= limit * fraction:
+            return f"{LIMIT_LABELS[key]} {spent:,.2f} of {limit:,}"
+    return None
+
+class RunBudget:
+    """What one graph run (thread) spent, in total and per level."""
+
+    def __init__(self):
+        self.run = _counters()
+        self.levels: Dict[Optional[int], dict] = {}
+        self.level: Optional[int] = None
+        self.downgraded = False
+        self.restored = False
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> dict:
+        """What the run and its current level spent, to be kept in the checkpointed state."""
+        with self._lock:
+            level = self.levels.get(self.level)
+            return {"run": _saved(self.run), "level": self.level, "level_spent": _saved(level) if level else None}
+
+    def restore(self, snapshot: Optional[dict]) -> None:
+        """Add the spend a resumed run checkpointed before it was interrupted, once."""
+        with self._lock:
+            if self.restored:
+                return
+            self.restored = True
+            if not snapshot:
+                return
+            saved = [(self.run, snapshot["run"])]
+            if snapshot["level_spent"]:
+                saved.append((self.levels.setdefault(snapshot["level"], _counters()), snapshot["level_spent"]))
+            for counters, spent in saved:
+                for key, amount in spent.items():
+                    if key == "seconds":
+                        counters["started"] -= amount
+                    else:
+                        counters[key] += amount
+
+    def enter_level(self, level: int) -> None:
+        with self._lock:
+            if self.level is None:
+                # Calls made before the level was known, e.g. after --resume, belong to it
+                self.levels[level] = self.levels.pop(None, None) or _counters()
+            elif level != self.level:
+                # A level limit that triggered the downgrade no longer applies
+                self.downgraded = False
+            self.level = level
+            self.levels.setdefault(level, _counters())
+
+    def charge(self, **amounts: float) -> None:
+        with self._lock:
+            level = self.levels.setdefault(self.level, _counters())
+            for key, amount in amounts.items():
+                self.run[key] += amount
+                level[key] += amount
+
+    def exceeded(self) -> Optional[str]:
+        """Why the run must stop, or None while every run and level limit holds."""
+        with self._lock:
+            reason = _over(self.run, BUDGET_RUN_LIMITS)
+            if reason:
+                return f"Run budget spent: {reason}"
+            if self.level in self.levels:
+                reason = _over(self.levels[self.level], BUDGET_LEVEL_LIMITS)
+                if reason:
+                    return f"Level {self.level} budget spent: {reason}"
+        return None
+
+    def near_limit(self) -> Optional[str]:
+        """The first limit past BUDGET_DOWNGRADE_AT of its value, if any."""
+        with self._lock:
+            return _over(self.run, BUDGET_RUN_LIMITS, BUDGET_DOWNGRADE_AT) or (
+                _over(self.levels[self.level], BUDGET_LEVEL_LIMITS, BUDGET_DOWNGRADE_AT) if self.level in self.levels else None
+            )
+
+_budgets: Dict[str, RunBudget] = {}
+_lock = threading.Lock()
+
+def _thread_id() -> str:
+    # Calls outside a graph run (scripts, prefetching) share one budget
+    try:
+        return get_config().get("configurable", {}).get("thread_id") or ""
+    except RuntimeError:
+        return ""
+
+def current_budget() -> RunBudget:
+    """The budget of the graph run making the current call."""
+    thread_id = _thread_id()
+    with _lock:
+        if thread_id not in _budgets:
+            _budgets[thread_id] = RunBudget()
+        return _budgets[thread_id]
+
+def reset_budget(thread_id: str) -> None:
+    """Forget a thread's budget when its run ends or a campaign reuses its label."""
+    with _lock:
+        _budgets.pop(thread_id, None)
+
+def track_level(level: int) -> None:
+    """Charge the current run's next calls to this level."""
+    current_budget().enter_level(level)
+
+def charge_llm(usage: Dict[str, int]) -> None:
+    current_budget().charge(
+        input_tokens=usage["input_tokens"],
+        output_tokens=usage["output_tokens"],
+        cost=estimate_cost(usage)
+    )
+
+def charge_api_call() -> None:
+    current_budget().charge(api_calls=1)
+
+def context_scale() -> float:
+    """Factor for the attempt-history context budgets: reduced once the run nears a limit."""
+    budget = current_budget()
+    if budget.downgraded:
+        return BUDGET_DOWNGRADE_CONTEXT_SCALE
+    reason = budget.near_limit()
+    if reason is None:
+        return 1.0
+    budget.downgraded = True
+    print(f"💸 Nearing the budget ({reason}); shrinking the attempt history sent to the LLM")
+    return BUDGET_DOWNGRADE_CONTEXT_SCALE
+
+def enforce_budget(state) -> None:
+    """Route the run to END once a run or level limit is spent.
+
+    Checked after every analyzed attempt, so a run can overshoot a limit by at
+    most one strategist, prompt engineer and analyzer cycle. The spend is kept
+    in the state, so a run continued with --resume counts what it spent before.
+    """
+    budget = current_budget()
+    budget.restore(state["analysis"].get("budget"))
+    track_level(state["level"])
+    state["analysis"]["budget"] = budget.snapshot()
+    if state["next_agent"] == END:
+        return
+    reason = budget.exceeded()
+    if reason:
+        print(f"💸 {reason}, ending the run")
+        state["next_agent"] = END
+        state["analysis"]["budget_exceeded"] = reason
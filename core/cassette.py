@@ -0,0 +1,121 @@
+import hashlib
+import json
+import threading
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Optional
+
+from langchain_anthropic import ChatAnthropic
+from langchain_core.messages import messages_from_dict, messages_to_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from config.settings import CASSETTE_MODE, CASSETTE_FILE
+
+_mode: Optional[str] = CASSETTE_MODE
+_path = Path(CASSETTE_FILE)
+_tapes: Dict[str, Deque[Any]] = defaultdict(deque)
+_loaded = False
+_lock = threading.Lock()
+
+def configure_cassette(mode: Optional[str], path: Optional[str] = None) -> None:
+    """Switch between live calls (None), "record" and "replay"."""
+    global _mode, _path, _loaded
+    if mode not in (None, "record", "replay"):
+        raise ValueError(f"Unknown cassette mode: {mode}")
+    with _lock:
+        _mode = mode
+        if path is not None:
+            _path = Path(path)
+        _tapes.clear()
+        _loaded = False
+    if mode == "record":
+        _path.parent.mkdir(parents=True, exist_ok=True)
+        _path.write_text("")
+        print(f"📼 Recording API and LLM calls to {_path}")
+    elif mode == "replay":
+        print(f"📼 Replaying API and LLM calls from {_path}")
+
+def cassette_mode() -> Optional[str]:
+    return _mode
+
+def cassette_key(kind: str, request: Any) -> str:
+    """Stable key of a request; identical requests replay in recorded order."""
+    payload = json.dumps([kind, request], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def record(key: str, response: Any) -> None:
+    line = json.dumps({"key": key, "response": response}, separators=(",", ":"), ensure_ascii=False, default=str)
+    with _lock:
+        with open(_path, "a") as f:
+            f.write(line + "\n")
+
+def _load() -> None:
+    # Called with _lock held
+    global _loaded
+    if not _loaded:
+        with open(_path, "r") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    _tapes[entry["key"]].append(entry["response"])
+        _loaded = True
+
+def has_recording(key: str) -> bool:
+    """Whether a response for the key is left to replay."""
+    with _lock:
+        _load()
+        return bool(_tapes[key])
+
+def replay(key: str) -> Any:
+    """Serve the next recorded response for the key."""
+    with _lock:
+        _load()
+        if not _tapes[key]:
+            raise ValueError(f"Cassette {_path} has no recorded response for request {key[:12]}")
+        return _tapes[key].popleft()
+
+def _llm_request(model: str, messages: list, stop: Optional[list], kwargs: dict) -> dict:
+    # Message ids and response metadata differ between runs, so only the content is keyed
+    return {
+        "model": model,
+        "messages": [[m.type, m.content, getattr(m, "tool_calls", None) or []] for m in messages],
+        "stop": stop,
+        "kwargs": kwargs
+    }
+
+def _to_record(result: ChatResult) -> dict:
+    return {
+        "message": messages_to_dict([result.generations[0].message])[0],
+        "llm_output": result.llm_output
+    }
+
+def _from_record(data: dict) -> ChatResult:
+    message = messages_from_dict([data["message"]])[0]
+    return ChatResult(generations=[ChatGeneration(message=message)], llm_output=data["llm_output"])
+
+class CassetteChatAnthropic(ChatAnthropic):
+    """ChatAnthropic that records or replays its exchanges when a cassette is active.
+
+    Hooking the generation methods covers plain invoke as well as
+    with_structured_output, which is bound on top of them.
+    """
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if _mode is None:
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        key = cassette_key("llm", _llm_request(self.model, messages, stop, kwargs))
+        if _mode == "replay":
+            return _from_record(replay(key))
+        result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        record(key, _to_record(result))
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if _mode is None:
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        key = cassette_key("llm", _llm_request(self.model, messages, stop, kwargs))
+        if _mode == "replay":
+            return _from_record(replay(key))
+        result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        record(key, _to_record(result))
+        return result
@@ -0,0 +1,110 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.api import DefenderInfo, get_defender_info, aget_defender_info
+from core.history import HISTORY_FILE, attempt_defenders, file_lock, write_json_atomic
+from config.settings import DEFENDER_CACHE_TTL, DEFENDER_CACHE_SIZE, KNOWN_DEFENDERS
+
+DEFENDER_CACHE_FILE = HISTORY_FILE.parent / "defenders_cache.json"
+
+_memory: "OrderedDict[str, Tuple[float, DefenderInfo]]" = OrderedDict()
+_lock = threading.Lock()
+
+def _load_disk() -> Dict[str, dict]:
+    if DEFENDER_CACHE_FILE.exists():
+        try:
+            with open(DEFENDER_CACHE_FILE, 'r') as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+    return {}
+
+def _save_disk(data: Dict[str, dict]) -> None:
+    write_json_atomic(DEFENDER_CACHE_FILE, data)
+
+def _remember(defender: str, fetched_at: float, info: DefenderInfo) -> None:
+    _memory[defender] = (fetched_at, info)
+    _memory.move_to_end(defender)
+    while len(_memory) > DEFENDER_CACHE_SIZE:
+        _memory.popitem(last=False)
+
+def _lookup(defender: str) -> Optional[DefenderInfo]:
+    """Return a fresh cached entry from memory or disk, if any."""
+    now = time.time()
+    with _lock:
+        if defender in _memory:
+            fetched_at, info = _memory[defender]
+            if now - fetched_at < DEFENDER_CACHE_TTL:
+                _memory.move_to_end(defender)
+                return info
+            del _memory[defender]
+
+        entry = _load_disk().get(defender)
+        if entry and now - entry["fetched_at"] < DEFENDER_CACHE_TTL:
+            info = DefenderInfo(**entry["info"])
+            _remember(defender, entry["fetched_at"], info)
+            return info
+    return None
+
+def _store(defender: str, info: DefenderInfo) -> None:
+    fetched_at = time.time()
+    with _lock:
+        _remember(defender, fetched_at, info)
+        with file_lock(DEFENDER_CACHE_FILE):
+            data = _load_disk()
+            data[defender] = {"fetched_at": fetched_at, "info": info.model_dump()}
+            _save_disk(data)
+
+def peek_defender_info(defender: str) -> Optional[DefenderInfo]:
+    """Cached defender info without calling the API, or None."""
+    return _lookup(defender)
+
+def get_cached_defender_info(defender: str) -> DefenderInfo:
+    """Get defender info from the cache, fetching it from the API when stale."""
+    info = _lookup(defender)
+    if info is None:
+        info = get_defender_info(defender)
+        _store(defender, info)
+    return info
+
+async def aget_cached_defender_info(defender: str) -> DefenderInfo:
+    """Async variant of get_cached_defender_info."""
+    info = _lookup(defender)
+    if info is None:
+        info = await aget_defender_info(defender)
+        _store(defender, info)
+    return info
+
+def invalidate_defender_info(defender: Optional[str] = None) -> None:
+    """Drop one defender (or every defender when None) from both cache layers."""
+    with _lock:
+        with file_lock(DEFENDER_CACHE_FILE):
+            if defender is None:
+                _memory.clear()
+                _save_disk({})
+                return
+            _memory.pop(defender, None)
+            data = _load_disk()
+            if data.pop(defender, None) is not None:
+                _save_disk(data)
+
+def known_defenders() -> List[str]:
+    """Defenders from settings plus any seen in the completion or attempts history."""
+    defenders = list(KNOWN_DEFENDERS)
+    if HISTORY_FILE.exists():
+        with open(HISTORY_FILE, 'r') as f:
+            for entry in json.load(f).get("entries", []):
+                defenders.extend(filter(None, [entry.get("defender"), entry.get("next_defender")]))
+    defenders.extend(attempt_defenders())
+    return list(dict.fromkeys(defenders))
+
+def prefetch_defender_info(defenders: Optional[Iterable[str]] = None) -> None:
+    """Warm the cache for the given defenders, defaulting to every known one."""
+    for defender in defenders if defenders is not None else known_defenders():
+        try:
+            get_cached_defender_info(defender)
+        except ValueError as e:
+            print(f"⚠️ Could not prefetch defender '{defender}': {e}")
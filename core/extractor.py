@@ -0,0 +1,189 @@
+import base64
+import binascii
+import re
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+NATO_ALPHABET = {
+    "alpha": "A", "alfa": "A", "bravo": "B", "charlie": "C", "delta": "D", "echo": "E",
+    "foxtrot": "F", "golf": "G", "hotel": "H", "india": "I", "juliet": "J", "juliett": "J",
+    "kilo": "K", "lima": "L", "mike": "M", "november": "N", "oscar": "O", "papa": "P",
+    "quebec": "Q", "romeo": "R", "sierra": "S", "tango": "T", "uniform": "U", "victor": "V",
+    "whiskey": "W", "whisky": "W", "xray": "X", "x-ray": "X", "yankee": "Y", "zulu": "Z"
+}
+
+LEET = str.maketrans({"0": "O", "1": "I", "3": "E", "4": "A", "5": "S", "7": "T", "8": "B", "@": "A", "$": "S"})
+
+# Words that show up in leak phrasing but are never the password itself
+STOPWORDS = {
+    "THE", "PASSWORD", "SECRET", "IS", "A", "AN", "AND", "OR", "I", "YOU", "IT", "MY", "YOUR", "THAT",
+    "THIS", "NOT", "CANNOT", "SORRY", "WORD", "CODE", "KEY", "HERE", "WHAT", "NO", "YES"
+}
+
+DIRECT_PATTERNS = [
+    r"(?:password|secret(?:\s+(?:word|code|key))?|passphrase|pass\s*word)\s*(?:(?:is|was|would be)\s*[:=\-]?|[:=\-])\s*[\"'“‘`*]*([A-Za-z0-9@$][A-Za-z0-9@$\-\. ]{1,40}?)[\"'”’`*]*(?=[\s\.,!?;:)]|$)",
+    r"[\"'“‘`]([A-Z][A-Z0-9]{3,})[\"'”’`]"
+]
+
+SEPARATED_PATTERN = r"\b((?:[A-Za-z0-9][\s\-\.\*_:|/,]{1,3}){3,}[A-Za-z0-9])\b"
+
+class Candidate(BaseModel):
+    password: str
+    confidence: float
+    source: str
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]", "", text).upper()
+
+def _add(candidates: Dict[str, Candidate], raw: str, confidence: float, source: str) -> None:
+    password = _normalize(raw)
+    if len(password) < 3 or password in STOPWORDS:
+        return
+    if password not in candidates or candidates[password].confidence < confidence:
+        candidates[password] = Candidate(password=password, confidence=confidence, source=source)
+
+def _add_with_leet(candidates: Dict[str, Candidate], raw: str, confidence: float, source: str) -> None:
+    # Digits are usually part of the password ("2FAST4U"); the leet reading is only a fallback
+    _add(candidates, raw, confidence, source)
+    if _normalize(raw.translate(LEET)) != _normalize(raw):
+        _add(candidates, raw.translate(LEET), confidence / 2, f"{source}-leet")
+
+def _direct(response: str, candidates: Dict[str, Candidate]) -> None:
+    # Also match leetspeak phrasing such as "p455w0rd 1s"; LEET maps single characters,
+    # so the value is read from the same span of the original response
+    for text in (response, response.translate(LEET)):
+        match = re.search(DIRECT_PATTERNS[0], text, re.IGNORECASE)
+        if match:
+            value = response[match.start(1):match.end(1)].strip()
+            # Only a single token counts as a direct reveal; "is not something I can share" is not
+            if " " not in value and "-" not in value:
+                _add_with_leet(candidates, value, 0.95, "direct")
+    for quoted in re.findall(DIRECT_PATTERNS[1], response):
+        _add_with_leet(candidates, quoted, 0.6, "quoted")
+
+def _separated(response: str, candidates: Dict[str, Candidate], reversed_hint: bool) -> None:
+    for chunk in re.findall(SEPARATED_PATTERN, response):
+        letters = re.findall(r"[A-Za-z0-9]", chunk)
+        if any(len(part) > 1 for part in re.split(r"[\s\-\.\*_:|/,]+", chunk)):
+            continue
+        word = "".join(letters)
+        # A spelled-out leak phrase such as P-A-S-S-W-O-R-D is not the password read backwards either
+        if _normalize(word.translate(LEET)) in STOPWORDS:
+            continue
+        _add_with_leet(candidates, word, 0.85 if not reversed_hint else 0.5, "separated")
+        _add_with_leet(candidates, word[::-1], 0.85 if reversed_hint else 0.3, "separated-reversed")
+
+def _reversed(response: str, candidates: Dict[str, Candidate], reversed_hint: bool) -> None:
+    if not reversed_hint:
+        return
+    for word in re.findall(r"\b[A-Z]{4,}\b", response):
+        # The stopwords are checked on the word as written: "PASSWORD" must not become "DROWSSAP"
+        if word not in STOPWORDS:
+            _add(candidates, word[::-1], 0.8, "reversed")
+
+def _nato(response: str, candidates: Dict[str, Candidate]) -> None:
+    words = re.findall(r"[A-Za-z\-]+", response)
+    run = []
+    for word in words + [""]:
+        letter = NATO_ALPHABET.get(word.lower())
+        if letter:
+            run.append(letter)
+            continue
+        if len(run) >= 3:
+            _add(candidates, "".join(run), 0.85, "phonetic")
+        run = []
+
+def _acrostic(response: str, candidates: Dict[str, Candidate], acrostic_hint: bool) -> None:
+    lines = [line.strip(" \t-*•>0123456789.") for line in response.splitlines()]
+    lines = [line for line in lines if line]
+    if len(lines) >= 4:
+        _add(candidates, "".join(line[0] for line in lines), 0.8 if acrostic_hint else 0.3, "acrostic")
+
+def _base64(response: str, candidates: Dict[str, Candidate]) -> None:
+    for token in re.findall(r"\b[A-Za-z0-9+/]{8,}={0,2}", response):
+        if len(token) % 4:
+            continue
+        try:
+            decoded = base64.b64decode(token, validate=True).decode("ascii")
+        except (binascii.Error, UnicodeDecodeError):
+            continue
+        if re.fullmatch(r"[A-Za-z]{3,}", decoded.strip()):
+            _add(candidates, decoded, 0.85, "base64")
+
+def _caesar(response: str, candidates: Dict[str, Candidate], prompt: str) -> None:
+    text = f"{prompt}\n{response}".lower()
+    # Only an explicit cipher or rotation; "shift" alone is too common to decode every capitalized word
+    if not re.search(r"caesar|cipher|\brot-?\d|rotat", text):
+        return
+    shifts = {int(n) % 26 for n in re.findall(r"\brot-?(\d{1,2})", text)}
+    shifts.update(int(n) % 26 for n in re.findall(r"(?:shift(?:ed)?|rotated?|by|of)\s+(-?\d{1,2})", text))
+    shifts = (shifts or {1, 3, 13}) - {0}
+    for shift in shifts:
+        for word in re.findall(r"\b[A-Z]{4,}\b", response):
+            decoded = "".join(chr((ord(c) - 65 - shift) % 26 + 65) for c in word)
+            _add(candidates, decoded, 0.75, f"caesar-{shift}")
+
+def extract_candidates(response: str, prompt: Optional[str] = "") -> List[Candidate]:
+    """Decode common leak formats in a defender response into scored password candidates.
+
+    The prompt, when given, is only used for hints such as a requested
+    reversal, acrostic or Caesar shift.
+    """
+    prompt = prompt or ""
+    hints = f"{prompt}\n{response}".lower()
+    reversed_hint = any(word in hints for word in ("reverse", "backwards", "backward"))
+    acrostic_hint = any(word in hints for word in ("acrostic", "first letter", "first letters"))
+
+    candidates: Dict[str, Candidate] = {}
+    _direct(response, candidates)
+    _separated(response, candidates, reversed_hint)
+    _reversed(response, candidates, reversed_hint)
+    _nato(response, candidates)
+    _acrostic(response, candidates, acrostic_hint)
+    _base64(response, candidates)
+    _caesar(response, candidates, prompt)
+
+    return sorted(candidates.values(), key=lambda c: c.confidence, reverse=True)
+
+COMMON_BIGRAMS = {
+    "TH", "HE", "IN", "ER", "AN", "RE", "ON", "AT", "EN", "ND", "TI", "ES", "OR", "TE", "OF", "ED",
+    "IS", "IT", "AL", "AR", "ST", "TO", "NT", "NG", "SE", "HA", "AS", "OU", "IO", "LE", "VE", "CO",
+    "ME", "DE", "HI", "RI", "RO", "IC", "NE", "EA", "RA", "CE", "LI", "CH", "LL", "BE", "MA", "SI"
+}
+
+def _bigram_score(word: str) -> int:
+    return sum(word[i:i + 2] in COMMON_BIGRAMS for i in range(len(word) - 1))
+
+def _transpositions(word: str) -> List[str]:
+    """Adjacent-letter swaps, the ones producing more common English bigrams first."""
+    swaps = [word[:i] + word[i + 1] + word[i] + word[i + 2:] for i in range(len(word) - 1) if word[i] != word[i + 1]]
+    return sorted(swaps, key=_bigram_score, reverse=True)
+
+def expand_guesses(candidates: List[str], limit: int) -> List[str]:
+    """Turn ranked candidates into a ranked, de-duplicated list of guesses.
+
+    Each candidate is tried as given and normalized (upper case, no spaces or
+    punctuation); then come the top two fragments concatenated, and finally
+    adjacent-letter transpositions of the best candidate to fix near-miss typos.
+    """
+    guesses: List[str] = []
+
+    def push(value: str) -> None:
+        value = value.strip()
+        if value and value not in guesses:
+            guesses.append(value)
+
+    for candidate in candidates:
+        push(candidate)
+        push(_normalize(candidate))
+
+    normalized = [_normalize(c) for c in candidates if _normalize(c)]
+    if len(normalized) >= 2 and normalized[0] not in normalized[1] and normalized[1] not in normalized[0]:
+        push(normalized[0] + normalized[1])
+        push(normalized[1] + normalized[0])
+    if normalized:
+        for variant in _transpositions(normalized[0]):
+            push(variant)
+
+    return guesses[:limit]
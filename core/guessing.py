@@ -0,0 +1,110 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional, Tuple
+
+from core.api import guess_password, aguess_password, guess_was_recorded
+from core.history import load_rejected_guesses, add_rejected_guesses, normalize_guess
+from config.settings import GUESS_FANOUT
+
+# Guesses sent to the API and guesses skipped because they were already rejected
+guess_stats = {"sent": 0, "skipped": 0}
+
+def _report(password: str, result: dict) -> None:
+    status = "✅" if result.get("success") else "❌"
+    print(f"{status} Guess '{password}': {result.get('message') or result.get('error', '')}")
+
+def _filter_known_wrong(defender: str, guesses: List[str]) -> List[str]:
+    """Drop guesses already rejected for this defender and duplicates of the same normalized form."""
+    seen = load_rejected_guesses(defender)
+    fresh = []
+    for guess in guesses:
+        key = normalize_guess(guess)
+        if key in seen:
+            guess_stats["skipped"] += 1
+            continue
+        seen.add(key)
+        fresh.append(guess)
+    skipped = len(guesses) - len(fresh)
+    if skipped:
+        print(f"⏭️ Skipped {skipped} known-wrong guesses ({guess_stats['skipped']} API calls saved so far)")
+    guess_stats["sent"] += len(fresh)
+    return fresh
+
+def _replayable(defender: str, guesses: List[str], prompt: str, answer: str) -> List[str]:
+    # Concurrent guesses cancelled while recording have no response on the cassette
+    return [g for g in guesses if guess_was_recorded(defender, g, prompt, answer)]
+
+def guess_candidates(defender: str, guesses: List[str], prompt: str, answer: str) -> Tuple[Optional[str], dict, List[str]]:
+    """Verify guesses concurrently, at most GUESS_FANOUT at a time, stopping at the first success.
+
+    Guesses already rejected for the defender are skipped. Returns the winning
+    (or top-ranked) guess, its result, and every guess that was rejected; the
+    guess is None when there was nothing to guess.
+    """
+    fresh = _replayable(defender, _filter_known_wrong(defender, guesses), prompt, answer)
+    results = {}
+    with ThreadPoolExecutor(max_workers=GUESS_FANOUT) as executor:
+        # Each worker runs in a copy of the caller's context so the guess is charged to its graph run
+        futures = {executor.submit(contextvars.copy_context().run, guess_password, defender, g, prompt, answer): g for g in fresh}
+        for future in as_completed(futures):
+            password = futures[future]
+            results[password] = future.result()
+            _report(password, results[password])
+            if results[password].get("success"):
+                for pending in futures:
+                    pending.cancel()
+                break
+    # Leaving the executor waits for the guesses already in flight; they reached
+    # the API, so keep their results and let the rejected ones be remembered
+    for future, password in futures.items():
+        if password not in results and not future.cancelled() and future.exception() is None:
+            results[password] = future.result()
+            _report(password, results[password])
+    return _outcome(defender, guesses, fresh, results)
+
+async def aguess_candidates(defender: str, guesses: List[str], prompt: str, answer: str) -> Tuple[Optional[str], dict, List[str]]:
+    """Async variant of guess_candidates."""
+    fresh = _replayable(defender, _filter_known_wrong(defender, guesses), prompt, answer)
+    semaphore = asyncio.Semaphore(GUESS_FANOUT)
+    results = {}
+
+    async def attempt(password: str) -> Tuple[str, dict]:
+        async with semaphore:
+            return password, await aguess_password(defender, password, prompt, answer)
+
+    tasks = [asyncio.ensure_future(attempt(g)) for g in fresh]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            password, result = await next_done
+            results[password] = result
+            _report(password, result)
+            if result.get("success"):
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return _outcome(defender, guesses, fresh, results)
+
+def _as_result(result: dict) -> dict:
+    # An API error body becomes a failed guess, so callers can always read "success"
+    if "error" in result:
+        return {"success": False, "message": f"API error: {result['error']}"}
+    return result
+
+def _outcome(defender: str, guesses: List[str], fresh: List[str], results: dict) -> Tuple[Optional[str], dict, List[str]]:
+    winner: Optional[str] = next((g for g in fresh if results.get(g, {}).get("success")), None)
+    # Only a real answer rejects a guess; an error body (e.g. a 429 after the retries) leaves it retryable
+    rejected = [g for g in fresh if g in results and "error" not in results[g] and results[g].get("success") is False]
+    add_rejected_guesses(defender, rejected)
+
+    if winner:
+        return winner, results[winner], rejected
+    if not guesses:
+        # e.g. an empty <answer></answer>, which expand_guesses drops
+        return None, {"success": False, "message": "No password to guess"}, rejected
+    if not fresh:
+        return guesses[0], {"success": False, "message": "All candidates were already rejected"}, rejected
+    password = fresh[0]
+    return password, _as_result(results.get(password, {"success": False, "message": "Guess not completed"})), rejected
@@ -1,52 +1,333 @@
 import json
+import os
+import re
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterator, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from core.store import HistoryStore, normalize_prompt
+from config.settings import ATTEMPTS_COMPACT_EVERY, HISTORY_BACKEND
 
 HISTORY_FILE = Path("history.json")
 ATTEMPTS_HISTORY_FILE = Path("attempts_history.json")
+ATTEMPTS_LOG_FILE = Path("attempts_history.jsonl")
+HISTORY_DB_FILE = Path("history.db")
+REJECTED_GUESSES_FILE = Path("rejected_guesses.json")
+
+_appends_since_compaction = None
+_store: Optional[HistoryStore] = None
+# Attempts per defender shared by the runs of a process, revalidated against the store
+_attempts_cache: Dict[str, List[Dict[str, str]]] = {}
+# Latest response per normalized prompt of each cached defender, for the JSON backend
+_prompt_index: Dict[str, Dict[str, str]] = {}
+# Newest SQLite attempt id, or the JSON files' sizes and mtimes, each cache reflects
+_cache_versions: Dict[str, Any] = {}
+_cache_lock = threading.Lock()
+
+def get_history_store() -> HistoryStore:
+    """Open the SQLite store, importing the JSON history files on first use."""
+    global _store
+    if _store is None:
+        # Lock so concurrent processes import the JSON files only once
+        with file_lock(HISTORY_DB_FILE):
+            store = HistoryStore(HISTORY_DB_FILE)
+            if store.is_empty():
+                for defender, attempts in _load_json_attempts().items():
+                    store.add_attempts(defender, attempts)
+                for entry in _load_completion_data()["entries"]:
+                    store.add_completion(entry)
+        _store = store
+    return _store
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive cross-process lock on a sidecar <path>.lock file."""
+    lock_path = path.with_name(f"{path.name}.lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, 'a+') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def write_json_atomic(path: Path, data: Any, indent: int = 2) -> None:
+    """Write JSON to a temp file and rename it over path so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_file, 'w') as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+def _read_log() -> List[Dict[str, str]]:
+    """Read logged attempts, ignoring a torn trailing line from an interrupted write."""
+    records = []
+    if ATTEMPTS_LOG_FILE.exists():
+        with open(ATTEMPTS_LOG_FILE, 'r') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return records
+
+def _merge_log(history: Dict[str, List[Dict[str, str]]], records: List[Dict[str, str]]) -> Dict[str, List[Dict[str, str]]]:
+    # A crash between snapshot rename and log truncation can leave records in both
+    seen = {
+        (defender, attempt.get("timestamp"), attempt.get("prompt"))
+        for defender, attempts in history.items()
+        for attempt in attempts
+    }
+    for record in records:
+        defender = record.pop("defender")
+        key = (defender, record.get("timestamp"), record.get("prompt"))
+        if key not in seen:
+            seen.add(key)
+            history.setdefault(defender, []).append(record)
+    return history
+
+def _write_snapshot(history: Dict[str, List[Dict[str, str]]]) -> None:
+    # Caller must hold the ATTEMPTS_HISTORY_FILE lock
+    global _appends_since_compaction
+    write_json_atomic(ATTEMPTS_HISTORY_FILE, history)
+    if ATTEMPTS_LOG_FILE.exists():
+        ATTEMPTS_LOG_FILE.unlink()
+    _appends_since_compaction = 0
 
 def save_attempt_history(history: Dict[str, List[Dict[str, str]]]) -> None:
-    """Save the attempts history to a file."""
-    ATTEMPTS_HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(ATTEMPTS_HISTORY_FILE, 'w') as f:
-        json.dump(history, f, indent=2)
+    """Save the full attempts history as a snapshot, replacing the append log."""
+    with file_lock(ATTEMPTS_HISTORY_FILE):
+        _write_snapshot(history)
+
+def _json_version() -> tuple:
+    # Every write, by this or another process, changes the size or mtime of one of the files
+    return tuple(
+        (path.stat().st_mtime_ns, path.stat().st_size) if path.exists() else None
+        for path in (ATTEMPTS_HISTORY_FILE, ATTEMPTS_LOG_FILE)
+    )
 
-def load_attempt_history() -> Dict[str, List[Dict[str, str]]]:
-    """Load the attempts history from file."""
+def _extend_cache(defender: str, attempts: List[Dict[str, str]]) -> None:
+    # Caller must hold _cache_lock
+    _attempts_cache[defender].extend(attempts)
+    _prompt_index[defender].update((normalize_prompt(a["prompt"]), a["response"]) for a in attempts)
+
+def append_attempt(defender: str, attempt: Dict[str, str], level: Optional[int] = None, strategy: Optional[str] = None) -> None:
+    """Persist a single attempt; the JSON backend appends to a periodically compacted log."""
+    global _appends_since_compaction
+    if HISTORY_BACKEND == "sqlite":
+        # defender_attempts picks the new row up by its id
+        get_history_store().add_attempt(defender, attempt, level=level, strategy=strategy)
+        return
+
+    line = json.dumps({"defender": defender, **attempt}) + "\n"
+    with file_lock(ATTEMPTS_HISTORY_FILE):
+        before = _json_version()
+        if _appends_since_compaction is None:
+            _appends_since_compaction = len(_read_log())
+
+        ATTEMPTS_LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(ATTEMPTS_LOG_FILE, 'ab+') as f:
+            # Start on a fresh line if a previous write was torn mid-record
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    line = "\n" + line
+            f.write(line.encode())
+            f.flush()
+            os.fsync(f.fileno())
+
+        _appends_since_compaction += 1
+        if _appends_since_compaction >= ATTEMPTS_COMPACT_EVERY:
+            _write_snapshot(_read_json_attempts())
+        after = _json_version()
+
+    # Caches that were current before this write only miss this attempt; the others reload
+    with _cache_lock:
+        for name, version in _cache_versions.items():
+            if version == before:
+                _cache_versions[name] = after
+                if name == defender:
+                    _extend_cache(defender, [attempt])
+
+def compact_attempt_history() -> None:
+    """Fold the append log into the attempts_history.json snapshot."""
+    with file_lock(ATTEMPTS_HISTORY_FILE):
+        _write_snapshot(_read_json_attempts())
+
+def _read_json_attempts() -> Dict[str, List[Dict[str, str]]]:
+    # Caller must hold the ATTEMPTS_HISTORY_FILE lock
+    history = {}
     if ATTEMPTS_HISTORY_FILE.exists():
         with open(ATTEMPTS_HISTORY_FILE, 'r') as f:
+            history = json.load(f)
+    return _merge_log(history, _read_log())
+
+def _load_json_attempts() -> Dict[str, List[Dict[str, str]]]:
+    with file_lock(ATTEMPTS_HISTORY_FILE):
+        return _read_json_attempts()
+
+def load_attempt_history(defender: Optional[str] = None) -> Dict[str, List[Dict[str, str]]]:
+    """Load the attempts history, optionally only for a single defender."""
+    if defender is not None:
+        return {defender: load_defender_attempts(defender)}
+    if HISTORY_BACKEND == "sqlite":
+        store = get_history_store()
+        return {name: store.attempts_for(name) for name in store.defenders()}
+    return _load_json_attempts()
+
+def load_defender_attempts(defender: str) -> List[Dict[str, str]]:
+    """Load the attempts made against one defender, oldest first."""
+    if HISTORY_BACKEND == "sqlite":
+        return get_history_store().attempts_for(defender)
+    return _load_json_attempts().get(defender, [])
+
+def defender_attempts(defender: str) -> List[Dict[str, str]]:
+    """The attempts against one defender, oldest first, shared by every run in the process.
+
+    Loaded from the history on first use and revalidated on every call, so
+    attempts other processes (e.g. campaign workers) store are seen too.
+    SQLite fetches only the rows after the newest id already cached; the JSON
+    files are reread when their size or mtime changed. Agents read this
+    instead of carrying the attempts in the graph state. Callers must not
+    modify the returned list.
+    """
+    with _cache_lock:
+        if HISTORY_BACKEND == "sqlite":
+            if defender not in _attempts_cache:
+                _attempts_cache[defender], _prompt_index[defender] = [], {}
+            last_id, attempts = get_history_store().attempts_after(defender, _cache_versions.get(defender, 0))
+            _cache_versions[defender] = last_id
+            _extend_cache(defender, attempts)
+        else:
+            version = _json_version()
+            if defender not in _attempts_cache or _cache_versions[defender] != version:
+                _attempts_cache[defender], _prompt_index[defender] = [], {}
+                _cache_versions[defender] = version
+                _extend_cache(defender, _load_json_attempts().get(defender, []))
+        return _attempts_cache[defender]
+
+def attempt_defenders() -> List[str]:
+    """Names of every defender with at least one recorded attempt."""
+    if HISTORY_BACKEND == "sqlite":
+        return get_history_store().defenders()
+    return list(_load_json_attempts().keys())
+
+def last_attempts(defender: str, n: int) -> List[Dict[str, str]]:
+    """The n most recent attempts against a defender, oldest first."""
+    if HISTORY_BACKEND == "sqlite":
+        return get_history_store().last_attempts(defender, n)
+    return load_defender_attempts(defender)[-n:] if n > 0 else []
+
+def attempts_with_strategy(strategy: str, defender: Optional[str] = None) -> List[Dict[str, str]]:
+    """Attempts recorded under a strategy containing the given text (SQLite backend only)."""
+    if HISTORY_BACKEND == "sqlite":
+        return get_history_store().attempts_with_strategy(strategy, defender)
+    return []
+
+def successful_entries(defender: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Completed levels from history.json, optionally filtered by defender."""
+    if HISTORY_BACKEND == "sqlite":
+        return get_history_store().successful_entries(defender)
+    return [
+        entry for entry in _load_completion_data()["entries"]
+        if defender is None or entry["defender"] == defender
+    ]
+
+def find_cached_response(defender: str, prompt: str) -> Optional[str]:
+    """The latest recorded response to the same normalized prompt, if it was sent before."""
+    if HISTORY_BACKEND == "sqlite":
+        matches = get_history_store().attempts_with_prompt(defender, prompt)
+        return matches[-1]["response"] if matches else None
+    # The JSON files have no index; look the prompt up in the cached attempts instead of reparsing them
+    defender_attempts(defender)
+    with _cache_lock:
+        return _prompt_index[defender].get(normalize_prompt(prompt))
+
+def normalize_guess(password: str) -> str:
+    """Canonical form of a password guess: upper case letters and digits only."""
+    return re.sub(r"[^A-Z0-9]", "", password.upper())
+
+def _load_rejected_data() -> Dict[str, List[str]]:
+    if REJECTED_GUESSES_FILE.exists():
+        with open(REJECTED_GUESSES_FILE, "r") as f:
             return json.load(f)
     return {}
 
-def save_completion_history(level: int, defender: str, prompt: str, answer: str, password: str, next_defender: str = None) -> None:
-    """Save a successful level completion to history."""
-    history_data = {"lastCompletedLevel": 0, "entries": []}
-    
+def load_rejected_guesses(defender: str) -> Set[str]:
+    """Normalized passwords the API already rejected for a defender."""
+    if HISTORY_BACKEND == "sqlite":
+        return set(get_history_store().rejected_guesses(defender))
+    return set(_load_rejected_data().get(defender, []))
+
+def add_rejected_guesses(defender: str, passwords: List[str]) -> None:
+    """Remember rejected passwords for a defender, normalized."""
+    normalized = {normalize_guess(p) for p in passwords} - {""}
+    if not normalized:
+        return
+    if HISTORY_BACKEND == "sqlite":
+        get_history_store().add_rejected_guesses(defender, sorted(normalized))
+        return
+    with file_lock(REJECTED_GUESSES_FILE):
+        data = _load_rejected_data()
+        data[defender] = sorted(set(data.get(defender, [])) | normalized)
+        write_json_atomic(REJECTED_GUESSES_FILE, data)
+
+def _load_completion_data() -> Dict[str, Any]:
     if HISTORY_FILE.exists():
         with open(HISTORY_FILE, "r") as f:
-            history_data = json.load(f)
-    
-    # Check if level entry already exists
-    level_exists = any(
-        entry["level"] == level 
-        for entry in history_data["entries"]
-    )
-    
-    if not level_exists:
-        history_data["lastCompletedLevel"] = level
-        history_data["entries"].append({
-            "level": level,
-            "defender": defender,
-            "prompt": prompt,
-            "answer": answer,
-            "password": password,
-            "next_defender": next_defender
-        })
+            return json.load(f)
+    return {"lastCompletedLevel": 0, "entries": []}
+
+def save_completion_history(level: int, defender: str, prompt: str, answer: str, password: str, next_defender: str = None,
+                            strategy: Optional[str] = None, description: Optional[str] = None) -> None:
+    """Save a successful level completion to history, with the strategy and defender description for core.library."""
+    entry = {
+        "level": level,
+        "defender": defender,
+        "prompt": prompt,
+        "answer": answer,
+        "password": password,
+        "next_defender": next_defender,
+        "strategy": strategy,
+        "description": description
+    }
+
+    # Re-read under the lock so completions from other processes are merged, not lost
+    with file_lock(HISTORY_FILE):
+        history_data = _load_completion_data()
         
-        HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
-        with open(HISTORY_FILE, "w") as f:
-            json.dump(history_data, f, indent=2)
+        # Check if level entry already exists; the first process to finish a level wins
+        level_exists = any(
+            existing["level"] == level 
+            for existing in history_data["entries"]
+        )
+        
+        if not level_exists:
+            history_data["entries"].append(entry)
+            history_data["entries"].sort(key=lambda existing: existing["level"])
+            history_data["lastCompletedLevel"] = max(history_data.get("lastCompletedLevel", 0), level)
+            write_json_atomic(HISTORY_FILE, history_data)
+
+    if not level_exists and HISTORY_BACKEND == "sqlite":
+        get_history_store().add_completion(entry)
 
 def get_current_level_info() -> tuple[str, int]:
     """Get the current defender and level from history."""
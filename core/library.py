@@ -0,0 +1,82 @@
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.history import successful_entries
+from config.settings import STRATEGY_LIBRARY_TOP_K, STRATEGY_LIBRARY_MIN_SIMILARITY
+
+# Words every defender description shares, left out of the similarity
+STOP_WORDS = {
+    "a", "an", "and", "are", "at", "be", "but", "by", "for", "i", "i'm", "i've", "if", "in", "is", "it",
+    "me", "my", "of", "on", "or", "so", "that", "the", "to", "you", "your", "with", "password"
+}
+
+def _terms(text: str) -> List[str]:
+    return [word for word in re.findall(r"[a-z0-9']+", text.lower()) if word not in STOP_WORDS]
+
+def _document(entry: Dict[str, Any]) -> str:
+    # Older history.json entries have no description or strategy; fall back to the winning prompt
+    return " ".join(filter(None, [entry.get("description"), entry.get("strategy"), entry.get("prompt")]))
+
+class StrategyLibrary:
+    """TF-IDF index of completed levels, searched by the description of a new defender."""
+
+    def __init__(self, entries: List[Dict[str, Any]]):
+        self.entries = entries
+        counts = [Counter(_terms(_document(entry))) for entry in entries]
+        document_frequency = Counter(term for count in counts for term in count)
+        self._idf = {
+            term: math.log((1 + len(entries)) / (1 + frequency)) + 1
+            for term, frequency in document_frequency.items()
+        }
+        self._vectors = [self._weigh(count) for count in counts]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _weigh(self, count: Counter) -> Dict[str, float]:
+        vector = {term: n * self._idf.get(term, 0.0) for term, n in count.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+    def search(self, text: str, k: int, exclude_defender: Optional[str] = None) -> List[Tuple[float, Dict[str, Any]]]:
+        """The k entries most similar to the text by cosine similarity, best first.
+
+        Ties, including entries sharing no terms with the text, go to the
+        latest levels, whose techniques beat the strongest defenders so far.
+        """
+        query = self._weigh(Counter(_terms(text)))
+        scored = [
+            (sum(weight * vector.get(term, 0.0) for term, weight in query.items()), entry)
+            for entry, vector in zip(self.entries, self._vectors)
+            if entry["defender"] != exclude_defender
+        ]
+        scored.sort(key=lambda item: (-item[0], -item[1]["level"]))
+        return scored[:k]
+
+_library: Optional[StrategyLibrary] = None
+
+def get_strategy_library() -> StrategyLibrary:
+    """The library of completed levels, rebuilt when a new completion was saved."""
+    global _library
+    entries = successful_entries()
+    if _library is None or len(_library) != len(entries):
+        _library = StrategyLibrary(entries)
+    return _library
+
+def similar_wins(description: str, defender: Optional[str] = None, k: int = STRATEGY_LIBRARY_TOP_K) -> List[Tuple[float, Dict[str, Any]]]:
+    """Past wins against other defenders most similar to the description."""
+    matches = get_strategy_library().search(description, k, exclude_defender=defender)
+    return [(score, entry) for score, entry in matches if score >= STRATEGY_LIBRARY_MIN_SIMILARITY]
+
+def render_wins(wins: List[Tuple[float, Dict[str, Any]]]) -> str:
+    """Render retrieved wins as compact text for the strategist prompt."""
+    lines = []
+    for score, entry in wins:
+        header = f"- Level {entry['level']} ({entry['defender']}, {score:.0%} similar)"
+        lines.append(f"{header}: {entry['description']}" if entry.get("description") else header)
+        if entry.get("strategy"):
+            lines.append(f"  Strategy: {entry['strategy']}")
+        lines.append(f"  Winning prompt: {' '.join(entry['prompt'].split())}")
+    return "\n".join(lines)
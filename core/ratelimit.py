@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import time
+from typing import Optional
+
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from config.settings import API_RATE_LIMIT, LLM_RATE_LIMIT
+
+class RateLimiter(BaseRateLimiter):
+    """Token bucket shared by every thread and event loop of the process.
+
+    Callers reserve a slot under the lock and then wait outside it, so waiters
+    are served in arrival order. A rate of None disables the limit.
+    """
+
+    def __init__(self, rate: Optional[float], burst: int = 1):
+        self._lock = threading.Lock()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate: Optional[float], burst: int = 1) -> None:
+        with self._lock:
+            self.rate = rate
+            self.burst = burst
+            self._tokens = float(burst)
+            self._updated = time.monotonic()
+
+    def _reserve(self, blocking: bool) -> Optional[float]:
+        """Take a token; return the seconds to wait for it, or None if unavailable without blocking."""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1 and not blocking:
+                return None
+            self._tokens -= 1
+            return max(-self._tokens / self.rate, 0.0)
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        wait = self._reserve(blocking)
+        if wait is None:
+            return False
+        if wait:
+            time.sleep(wait)
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        wait = self._reserve(blocking)
+        if wait is None:
+            return False
+        if wait:
+            await asyncio.sleep(wait)
+        return True
+
+# Shared by all solver sessions in the process
+api_rate_limiter = RateLimiter(API_RATE_LIMIT)
+llm_rate_limiter = RateLimiter(LLM_RATE_LIMIT)
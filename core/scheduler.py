@@ -0,0 +1,152 @@
+import math
+import random
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+from langgraph.graph import END
+from core.state import GandalfState
+from core.summary import is_refusal
+from config.settings import (
+    SCHEDULER,
+    MAX_ATTEMPTS_PER_LEVEL,
+    MAX_STRATEGIES_PER_LEVEL,
+    LEVEL_ATTEMPT_BUDGET,
+    SCHEDULER_UCB_EXPLORATION
+)
+
+# Reward of one failed attempt, from what the analyzer made of the response
+REWARD_WRONG_GUESS = 0.8  # Leaked something password-like that the API rejected
+REWARD_WEAK_LEAK = 0.5  # Local decodes too unsure to guess
+REWARD_ANSWERED = 0.2  # Played along without leaking
+REWARD_REFUSED = 0.0
+
+def attempt_reward(attempt: dict, analysis: dict, password: Optional[str]) -> float:
+    """How close a failed attempt came, between 0 (refused) and 1."""
+    if password:
+        return REWARD_WRONG_GUESS
+    if analysis.get("local_candidates"):
+        return REWARD_WEAK_LEAK
+    return REWARD_REFUSED if is_refusal(attempt["response"]) else REWARD_ANSWERED
+
+def _arms(state: GandalfState) -> Dict[str, dict]:
+    # Strategy -> pulls and summed reward, for the current level only
+    return state["analysis"].setdefault("arms", {})
+
+def record_outcome(state: GandalfState, reward: float) -> None:
+    """Count a failed attempt of the current strategy."""
+    arm = _arms(state).setdefault(state["analysis"].get("strategy") or "", {"pulls": 0, "reward": 0.0})
+    arm["pulls"] += 1
+    arm["reward"] += reward
+    state["attempts"] += 1
+
+def record_probe(state: GandalfState, reward: float) -> None:
+    """Count a fan-out branch that was not chosen.
+
+    It is an attempt for the fixed counters, but the bandits count the whole
+    batch as one pull, rewarded with the best result among its branches, so
+    fan-out does not spend LEVEL_ATTEMPT_BUDGET faster.
+    """
+    state["attempts"] += 1
+    state["analysis"]["batch_reward"] = max(state["analysis"].get("batch_reward", 0.0), reward)
+
+def start_level(state: GandalfState) -> None:
+    """Reset the counters after a solved level."""
+    state["attempts"] = 0
+    state["failed_strategies"] = 0
+    state["analysis"].pop("arms", None)
+    state["analysis"].pop("batch_reward", None)
+    state["analysis"].pop("mutate_prompt", None)
+
+class FixedScheduler:
+    """MAX_ATTEMPTS_PER_LEVEL attempts per strategy, MAX_STRATEGIES_PER_LEVEL strategies per level."""
+
+    def decide(self, state: GandalfState, attempt: dict, reward: float) -> None:
+        if state["attempts"] < MAX_ATTEMPTS_PER_LEVEL:
+            state["next_agent"] = "prompt_engineer"
+            return
+        print(f"Max attempts reached for current strategy.")
+        state["failed_strategies"] += 1
+        print(f"Strategy failed. Failed strategies: {state['failed_strategies']}/{MAX_STRATEGIES_PER_LEVEL}")
+        if state["failed_strategies"] >= MAX_STRATEGIES_PER_LEVEL:
+            print("Max strategies tried, ending level.")
+            state["next_agent"] = END
+        else:
+            print("Changing strategy...")
+            state["attempts"] = 0
+            state["next_agent"] = "strategist"
+
+class BanditScheduler(ABC):
+    """Chooses the strategy of the next attempt among those tried this level and a new one.
+
+    Each strategy is an arm scored from its attempts' rewards; the new-strategy
+    arm has no pulls, so it wins once the tried strategies look hopeless. When
+    the current strategy is kept after an attempt that leaked something, the
+    prompt engineer is asked to mutate that prompt instead of writing a new
+    one. The level ends when LEVEL_ATTEMPT_BUDGET attempts are spent.
+    """
+
+    @abstractmethod
+    def score(self, arm: dict, total: int, rng: random.Random) -> float:
+        """The arm's score; the highest-scoring arm is played next."""
+
+    def decide(self, state: GandalfState, attempt: dict, reward: float) -> None:
+        arms = _arms(state)
+        total = sum(arm["pulls"] for arm in arms.values())
+        if total >= LEVEL_ATTEMPT_BUDGET:
+            print(f"Attempt budget spent ({total}/{LEVEL_ATTEMPT_BUDGET}), ending level.")
+            state["next_agent"] = END
+            return
+
+        # Seeded from the position in the level so runs and replays decide alike
+        rng = random.Random(f"{state['current_defender']}:{state['level']}:{total}")
+        scores = {strategy: self.score(arm, total, rng) for strategy, arm in arms.items()}
+        new_score = self.score({"pulls": 0, "reward": 0.0}, total, rng)
+        current = state["analysis"].get("strategy") or ""
+        best = max(scores, key=scores.get)
+        print(f"🎰 Strategy scores: {', '.join(f'{s:.2f}' for s in scores.values())}, new {new_score:.2f}")
+
+        if new_score > scores[best]:
+            state["failed_strategies"] += 1
+            print(f"Changing strategy ({state['failed_strategies']} dropped this level)...")
+            state["attempts"] = 0
+            state["next_agent"] = "strategist"
+        elif best != current:
+            state["failed_strategies"] += 1
+            print("Returning to an earlier strategy:", best)
+            state["analysis"]["strategy"] = best
+            state["attempts"] = arms[best]["pulls"]
+            state["next_agent"] = "prompt_engineer"
+        elif reward >= REWARD_WEAK_LEAK:
+            print("Mutating the prompt that leaked part of the password...")
+            state["analysis"]["mutate_prompt"] = attempt["prompt"]
+            state["next_agent"] = "prompt_engineer"
+        else:
+            state["next_agent"] = "prompt_engineer"
+
+class ThompsonScheduler(BanditScheduler):
+    """Samples each arm's success rate from its Beta posterior."""
+
+    def score(self, arm: dict, total: int, rng: random.Random) -> float:
+        return rng.betavariate(1 + arm["reward"], 1 + arm["pulls"] - arm["reward"])
+
+class UCBScheduler(BanditScheduler):
+    """UCB1: mean reward plus an exploration bonus for rarely tried arms."""
+
+    def score(self, arm: dict, total: int, rng: random.Random) -> float:
+        pulls = max(arm["pulls"], 1)
+        mean = arm["reward"] / arm["pulls"] if arm["pulls"] else 0.5
+        return mean + SCHEDULER_UCB_EXPLORATION * math.sqrt(math.log(total + 1) / pulls)
+
+SCHEDULERS = {"fixed": FixedScheduler, "thompson": ThompsonScheduler, "ucb": UCBScheduler}
+
+def get_scheduler(name: Optional[str] = None):
+    name = name or SCHEDULER
+    if name not in SCHEDULERS:
+        raise ValueError(f"Unknown scheduler: {name}")
+    return SCHEDULERS[name]()
+
+def schedule_next(state: GandalfState, attempt: dict, password: Optional[str] = None) -> None:
+    """Count a failed attempt and let the configured scheduler pick the next agent."""
+    reward = max(attempt_reward(attempt, state["analysis"], password), state["analysis"].pop("batch_reward", 0.0))
+    record_outcome(state, reward)
+    get_scheduler().decide(state, attempt, reward)
@@ -0,0 +1,95 @@
+import hashlib
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from config.settings import PROMPT_SIMILARITY_THRESHOLD
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Fixed coefficients so signatures are stable across processes
+_PERMUTATIONS = [
+    (
+        int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % _PRIME or 1,
+        int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _PRIME
+    )
+    for i in range(NUM_PERM)
+]
+
+# Prompts that were regenerated instead of being sent as near-duplicates
+similarity_stats = {"checked": 0, "duplicates": 0}
+
+def shingles(text: str, k: int = 3) -> Set[str]:
+    """Word k-shingles of the normalized text; short texts fall back to single words."""
+    words = re.findall(r"[a-z0-9']+", text.lower())
+    if len(words) < k:
+        return set(words)
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+def minhash(shingle_set: Set[str]) -> Tuple[int, ...]:
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") for s in shingle_set]
+    if not hashes:
+        return (_MAX_HASH,) * NUM_PERM
+    return tuple(min(((a * h + b) % _PRIME) & _MAX_HASH for h in hashes) for a, b in _PERMUTATIONS)
+
+def _similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERM
+
+class PromptIndex:
+    """MinHash/LSH index of prompts already sent to one defender."""
+
+    def __init__(self, prompts: Optional[List[str]] = None):
+        self._prompts: List[str] = []
+        self._signatures: List[Tuple[int, ...]] = []
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        for prompt in prompts or []:
+            self.add(prompt)
+
+    def __len__(self) -> int:
+        return len(self._prompts)
+
+    def _bands(self, signature: Tuple[int, ...]):
+        for band in range(BANDS):
+            yield band, signature[band * ROWS:(band + 1) * ROWS]
+
+    def add(self, prompt: str) -> None:
+        signature = minhash(shingles(prompt))
+        position = len(self._prompts)
+        self._prompts.append(prompt)
+        self._signatures.append(signature)
+        for key in self._bands(signature):
+            self._buckets.setdefault(key, []).append(position)
+
+    def most_similar(self, prompt: str) -> Tuple[float, Optional[str]]:
+        """Estimated Jaccard similarity to the closest indexed prompt sharing an LSH band."""
+        signature = minhash(shingles(prompt))
+        candidates = {position for key in self._bands(signature) for position in self._buckets.get(key, [])}
+        best_score, best_prompt = 0.0, None
+        for position in candidates:
+            score = _similarity(signature, self._signatures[position])
+            if score > best_score:
+                best_score, best_prompt = score, self._prompts[position]
+        return best_score, best_prompt
+
+_indexes: Dict[str, PromptIndex] = {}
+
+def get_prompt_index(defender: str, attempts: List[Dict[str, str]]) -> PromptIndex:
+    """The defender's index, built from its attempts on first use and kept in sync afterwards."""
+    index = _indexes.get(defender)
+    if index is None or len(index) > len(attempts):
+        index = _indexes[defender] = PromptIndex()
+    for attempt in attempts[len(index):]:
+        index.add(attempt["prompt"])
+    return index
+
+def find_near_duplicate(defender: str, attempts: List[Dict[str, str]], prompt: str) -> Optional[str]:
+    """Return an earlier prompt at or above PROMPT_SIMILARITY_THRESHOLD, if any."""
+    similarity_stats["checked"] += 1
+    score, match = get_prompt_index(defender, attempts).most_similar(prompt)
+    if match is not None and score >= PROMPT_SIMILARITY_THRESHOLD:
+        similarity_stats["duplicates"] += 1
+        print(f"♻️ Prompt is {score:.0%} similar to an earlier attempt ({similarity_stats['duplicates']} sends avoided so far)")
+        return match
+    return None
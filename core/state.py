@@ -1,7 +1,7 @@
-from typing import Annotated, List, Dict, Any
+from typing import Annotated, List, Dict, Any, Optional
 from typing_extensions import TypedDict
 from langgraph.graph.message import add_messages
-from datetime import datetime
+from config.settings import STATE_MAX_MESSAGES
 
 def reducer_level(state: int, update: int) -> int:
     return update
@@ -12,14 +12,14 @@ def reducer_next_agent(state: str, update: str) -> str:
 def reducer_current_defender(state: str, update: str) -> str:
     return update
 
-def reducer_history(state: Dict[str, List[Dict[str, str]]], update: Dict[str, List[Dict[str, str]]]) -> Dict[str, List[Dict[str, str]]]:
-    return {**state, **update}
+def reducer_latest_attempt(state: Optional[Dict[str, str]], update: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+    return update
 
 def reducer_analysis(state: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
-    return {**state, **update}
-
-def reducer_completion_history(state: Dict[str, List[Dict[str, Any]]], update: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
-    return {**state, **update}
+    # Nodes edit the analysis in place and hand the same dict back; merge anything else without copying
+    if update is not state:
+        state.update(update)
+    return state
 
 def reducer_attempts(state: int, update: int) -> int:
     return update
@@ -27,13 +27,36 @@ def reducer_attempts(state: int, update: int) -> int:
 def reducer_failed_strategies(state: int, update: int) -> int:
     return update
 
+def reducer_probes(state: List[Dict[str, Any]], update: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Parallel probe branches each append their result; an empty update clears them
+    return state + update if update else []
+
+def reducer_messages(state: list, update: list) -> list:
+    # Defender responses, for display only; keep the newest STATE_MAX_MESSAGES
+    if not STATE_MAX_MESSAGES:
+        return []
+    return add_messages(state, update)[-STATE_MAX_MESSAGES:]
+
 class GandalfState(TypedDict):
-    messages: Annotated[list, add_messages]
+    """Run state kept small: the attempts themselves live in the history store.
+
+    latest_attempt is the attempt the analyzer works on; the full list for a
+    defender is read through core.history.defender_attempts.
+    """
+    messages: Annotated[list, reducer_messages]
     current_defender: Annotated[str, reducer_current_defender]
     level: Annotated[int, reducer_level]
-    history: Annotated[Dict[str, List[Dict[str, str]]], reducer_history]
+    latest_attempt: Annotated[Optional[Dict[str, str]], reducer_latest_attempt]
     analysis: Annotated[Dict[str, Any], reducer_analysis]
     next_agent: Annotated[str, reducer_next_agent]
-    completion_history: Annotated[Dict[str, List[Dict[str, Any]]], reducer_completion_history]
     attempts: Annotated[int, reducer_attempts]
-    failed_strategies: Annotated[int, reducer_failed_strategies] 
\ No newline at end of file
+    failed_strategies: Annotated[int, reducer_failed_strategies]
+    probes: Annotated[List[Dict[str, Any]], reducer_probes]
+
+# Small fields every agent node returns; messages and probes are only returned,
+# as deltas, by the nodes that add to them
+CONTROL_KEYS = ("current_defender", "level", "latest_attempt", "analysis", "next_agent", "attempts", "failed_strategies")
+
+def control_update(state: GandalfState, **deltas: Any) -> Dict[str, Any]:
+    """The update a node returns: its control fields plus any appended deltas."""
+    return {**{key: state[key] for key in CONTROL_KEYS}, **deltas}
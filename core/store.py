@@ -0,0 +1,184 @@
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    defender TEXT NOT NULL,
+    level INTEGER,
+    strategy TEXT,
+    prompt TEXT NOT NULL,
+    response TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_attempts_defender ON attempts (defender, id);
+CREATE INDEX IF NOT EXISTS idx_attempts_level ON attempts (level);
+CREATE INDEX IF NOT EXISTS idx_attempts_timestamp ON attempts (timestamp);
+CREATE INDEX IF NOT EXISTS idx_attempts_prompt_hash ON attempts (defender, prompt_hash);
+
+CREATE TABLE IF NOT EXISTS completions (
+    level INTEGER PRIMARY KEY,
+    defender TEXT NOT NULL,
+    prompt TEXT,
+    answer TEXT,
+    password TEXT,
+    next_defender TEXT,
+    strategy TEXT,
+    description TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_completions_defender ON completions (defender);
+
+CREATE TABLE IF NOT EXISTS rejected_guesses (
+    defender TEXT NOT NULL,
+    password TEXT NOT NULL,
+    PRIMARY KEY (defender, password)
+);
+"""
+
+def normalize_prompt(prompt: str) -> str:
+    """Prompt with surrounding whitespace stripped and inner runs collapsed to one space."""
+    return " ".join(prompt.split())
+
+def prompt_hash(prompt: str) -> str:
+    """Stable hash of a normalized prompt, used to index and look up identical prompts."""
+    return hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+
+def _attempt(row: sqlite3.Row) -> Dict[str, str]:
+    # Same shape as the entries in attempts_history.json
+    return {"prompt": row["prompt"], "response": row["response"], "timestamp": row["timestamp"]}
+
+class HistoryStore:
+    """SQLite-backed attempts and completions store with per-defender queries."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._add_missing_columns("completions", {"strategy": "TEXT", "description": "TEXT"})
+
+    def _add_missing_columns(self, table: str, columns: Dict[str, str]) -> None:
+        # Databases created before a column was added to SCHEMA
+        existing = {row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+        for name, kind in columns.items():
+            if name not in existing:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {kind}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            attempts = self._conn.execute("SELECT 1 FROM attempts LIMIT 1").fetchone()
+            completions = self._conn.execute("SELECT 1 FROM completions LIMIT 1").fetchone()
+        return attempts is None and completions is None
+
+    def add_attempt(self, defender: str, attempt: Dict[str, str], level: Optional[int] = None, strategy: Optional[str] = None) -> None:
+        self.add_attempts(defender, [attempt], level=level, strategy=strategy)
+
+    def add_attempts(self, defender: str, attempts: Iterable[Dict[str, str]], level: Optional[int] = None, strategy: Optional[str] = None) -> None:
+        rows = [
+            (defender, level, strategy, a["prompt"], a["response"], prompt_hash(a["prompt"]), a.get("timestamp", ""))
+            for a in attempts
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO attempts (defender, level, strategy, prompt, response, prompt_hash, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def add_completion(self, entry: Dict[str, Any]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO completions (level, defender, prompt, answer, password, next_defender, strategy, description) "
+                "VALUES (:level, :defender, :prompt, :answer, :password, :next_defender, :strategy, :description)",
+                {"next_defender": None, "strategy": None, "description": None, **entry}
+            )
+
+    def defenders(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT defender FROM attempts").fetchall()
+        return [row["defender"] for row in rows]
+
+    def attempts_for(self, defender: str) -> List[Dict[str, str]]:
+        """All attempts for one defender, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT prompt, response, timestamp FROM attempts WHERE defender = ? ORDER BY id",
+                (defender,)
+            ).fetchall()
+        return [_attempt(row) for row in rows]
+
+    def attempts_after(self, defender: str, after_id: int) -> Tuple[int, List[Dict[str, str]]]:
+        """The id of the newest attempt for one defender and the attempts after after_id, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, prompt, response, timestamp FROM attempts WHERE defender = ? AND id > ? ORDER BY id",
+                (defender, after_id)
+            ).fetchall()
+        return (rows[-1]["id"] if rows else after_id), [_attempt(row) for row in rows]
+
+    def last_attempts(self, defender: str, n: int) -> List[Dict[str, str]]:
+        """The n most recent attempts for a defender, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT prompt, response, timestamp FROM attempts WHERE defender = ? ORDER BY id DESC LIMIT ?",
+                (defender, n)
+            ).fetchall()
+        return [_attempt(row) for row in reversed(rows)]
+
+    def attempts_with_strategy(self, strategy: str, defender: Optional[str] = None) -> List[Dict[str, str]]:
+        """Attempts whose recorded strategy contains the given text."""
+        query = "SELECT prompt, response, timestamp FROM attempts WHERE strategy LIKE ?"
+        params: list = [f"%{strategy}%"]
+        if defender is not None:
+            query += " AND defender = ?"
+            params.append(defender)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id", params).fetchall()
+        return [_attempt(row) for row in rows]
+
+    def attempts_with_prompt(self, defender: str, prompt: str) -> List[Dict[str, str]]:
+        """Attempts for a defender that sent exactly this prompt."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT prompt, response, timestamp FROM attempts WHERE defender = ? AND prompt_hash = ? ORDER BY id",
+                (defender, prompt_hash(prompt))
+            ).fetchall()
+        return [_attempt(row) for row in rows]
+
+    def successful_entries(self, defender: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Completed levels in the same shape as history.json entries."""
+        query = "SELECT level, defender, prompt, answer, password, next_defender, strategy, description FROM completions"
+        params: list = []
+        if defender is not None:
+            query += " WHERE defender = ?"
+            params.append(defender)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY level", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def rejected_guesses(self, defender: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT password FROM rejected_guesses WHERE defender = ?",
+                (defender,)
+            ).fetchall()
+        return [row["password"] for row in rows]
+
+    def add_rejected_guesses(self, defender: str, passwords: Iterable[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO rejected_guesses (defender, password) VALUES (?, ?)",
+                [(defender, password) for password in passwords]
+            )
@@ -0,0 +1,138 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.ratelimit import api_rate_limiter
+from config.settings import (
+    API_CONNECT_TIMEOUT,
+    API_READ_TIMEOUT,
+    API_MAX_RETRIES,
+    API_RETRY_STATUSES,
+    API_BACKOFF_BASE,
+    API_BACKOFF_MAX,
+    API_POOL_SIZE,
+    API_MAX_CONCURRENCY_PER_HOST
+)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_host_semaphores_lock = threading.Lock()
+_async_clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+_async_host_semaphores: Dict[tuple, asyncio.Semaphore] = {}
+
+def get_session() -> requests.Session:
+    """Return the shared keep-alive session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=API_POOL_SIZE, pool_maxsize=API_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+def close_session() -> None:
+    """Close the shared session and drop its pooled connections."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def _host_semaphore(url: str) -> threading.BoundedSemaphore:
+    """Get the semaphore capping concurrent requests to the url's host."""
+    host = urlparse(url).netloc
+    with _host_semaphores_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(API_MAX_CONCURRENCY_PER_HOST)
+        return _host_semaphores[host]
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Full-jitter exponential backoff, honouring a Retry-After header in seconds."""
+    if retry_after:
+        try:
+            return min(float(retry_after), API_BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(API_BACKOFF_MAX, API_BACKOFF_BASE * (2 ** attempt)))
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """Send a request through the shared session, retrying transient failures."""
+    kwargs.setdefault("timeout", (API_CONNECT_TIMEOUT, API_READ_TIMEOUT))
+    semaphore = _host_semaphore(url)
+
+    for attempt in range(API_MAX_RETRIES + 1):
+        retry_after = None
+        api_rate_limiter.acquire()
+        try:
+            with semaphore:
+                response = get_session().request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == API_MAX_RETRIES:
+                raise
+            print(f"⚠️ {method} {url} failed ({e.__class__.__name__}), retrying...")
+        else:
+            if response.status_code not in API_RETRY_STATUSES or attempt == API_MAX_RETRIES:
+                return response
+            retry_after = response.headers.get("Retry-After")
+            print(f"⚠️ {method} {url} returned {response.status_code}, retrying...")
+
+        time.sleep(backoff_delay(attempt, retry_after))
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the keep-alive async client bound to the running event loop."""
+    loop = asyncio.get_running_loop()
+    if loop not in _async_clients:
+        _async_clients[loop] = httpx.AsyncClient(
+            timeout=httpx.Timeout(API_READ_TIMEOUT, connect=API_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=API_POOL_SIZE, max_keepalive_connections=API_POOL_SIZE)
+        )
+    return _async_clients[loop]
+
+async def aclose_async_client() -> None:
+    """Close the async client of the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+    for key in [key for key in _async_host_semaphores if key[0] is loop]:
+        del _async_host_semaphores[key]
+
+def _async_host_semaphore(url: str) -> asyncio.Semaphore:
+    """Get the asyncio semaphore capping concurrent requests to the url's host."""
+    key = (asyncio.get_running_loop(), urlparse(url).netloc)
+    if key not in _async_host_semaphores:
+        _async_host_semaphores[key] = asyncio.Semaphore(API_MAX_CONCURRENCY_PER_HOST)
+    return _async_host_semaphores[key]
+
+async def arequest(method: str, url: str, **kwargs) -> httpx.Response:
+    """Async counterpart of request() sharing the same retry policy."""
+    semaphore = _async_host_semaphore(url)
+
+    for attempt in range(API_MAX_RETRIES + 1):
+        retry_after = None
+        await api_rate_limiter.aacquire()
+        try:
+            async with semaphore:
+                response = await get_async_client().request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            if attempt == API_MAX_RETRIES:
+                raise
+            print(f"⚠️ {method} {url} failed ({e.__class__.__name__}), retrying...")
+        else:
+            if response.status_code not in API_RETRY_STATUSES or attempt == API_MAX_RETRIES:
+                return response
+            retry_after = response.headers.get("Retry-After")
+            print(f"⚠️ {method} {url} returned {response.status_code}, retrying...")
+
+        await asyncio.sleep(backoff_delay(attempt, retry_after))
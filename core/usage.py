@@ -0,0 +1,41 @@
+from typing import Any, Dict
+
+from core.budget import charge_llm
+
+# Running totals across every LLM call in this process
+usage_stats = {
+    "calls": 0,
+    "input_tokens": 0,
+    "output_tokens": 0,
+    "cache_read_tokens": 0,
+    "cache_creation_tokens": 0,
+    "cache_hits": 0
+}
+
+def _usage(response: Any) -> Dict[str, int]:
+    metadata = getattr(response, "usage_metadata", None) or {}
+    details = metadata.get("input_token_details") or {}
+    return {
+        "input_tokens": metadata.get("input_tokens", 0),
+        "output_tokens": metadata.get("output_tokens", 0),
+        "cache_read_tokens": details.get("cache_read") or 0,
+        "cache_creation_tokens": details.get("cache_creation") or 0
+    }
+
+def record_usage(agent: str, response: Any) -> Dict[str, int]:
+    """Log token and prompt-cache usage of an LLM response and add it to the totals."""
+    usage = _usage(response)
+    usage_stats["calls"] += 1
+    for key, value in usage.items():
+        usage_stats[key] += value
+    charge_llm(usage)
+
+    if usage["cache_read_tokens"]:
+        usage_stats["cache_hits"] += 1
+        cache = f"cache hit, {usage['cache_read_tokens']} cached tokens"
+    elif usage["cache_creation_tokens"]:
+        cache = f"cache miss, {usage['cache_creation_tokens']} tokens written"
+    else:
+        cache = "not cached"
+    print(f"💾 {agent} LLM call: {usage['input_tokens']} in / {usage['output_tokens']} out ({cache})")
+    return usage
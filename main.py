@@ -1,24 +1,52 @@
+import argparse
+import asyncio
+import uuid
+from datetime import datetime
+from functools import partial
+from typing import Optional
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
 from core.state import GandalfState
-from core.history import get_current_level_info, load_attempt_history
-from agents.strategist import strategist_agent
-from agents.prompt_engineer import prompt_engineer
-from agents.analyzer import response_analyzer
-from config.settings import GRAPH_CONFIG
+from core.history import get_current_level_info
+from core.transport import aclose_async_client
+from core.defenders import prefetch_defender_info
+from core.cassette import configure_cassette
+from core.checkpoint import create_checkpointer
+from core.budget import reset_budget
+import core.api
+from agents.strategist import strategist_agent, astrategist_agent
+from agents.prompt_engineer import prompt_engineer, aprompt_engineer
+from agents.analyzer import response_analyzer, aresponse_analyzer
+from agents.fanout import prompt_batch, aprompt_batch, probe, aprobe, fan_out, collect_probes
+from config.settings import GRAPH_CONFIG, PREFETCH_DEFENDERS, CASSETTE_FILE, PROMPT_FANOUT
 
-def build_gandalf_graph() -> StateGraph:
-    """Build the Gandalf challenge graph with all agent nodes."""
+def build_gandalf_graph(use_async: bool = False, fanout: int = PROMPT_FANOUT) -> StateGraph:
+    """Build the Gandalf challenge graph with all agent nodes.
+
+    With use_async the nodes are coroutines and the graph must be driven
+    through astream/ainvoke. With fanout above 1 the prompt engineer writes
+    that many prompts per step and each is sent, analyzed and guessed on its
+    own concurrent branch; the analyzer node then merges the branches.
+    Every step is checkpointed with the configured checkpoint backend.
+    """
     graph = StateGraph(GandalfState)
     
     # Add nodes
-    graph.add_node("strategist", strategist_agent)
-    graph.add_node("prompt_engineer", prompt_engineer)
-    graph.add_node("analyzer", response_analyzer)
+    graph.add_node("strategist", astrategist_agent if use_async else strategist_agent)
+    if fanout > 1:
+        graph.add_node("prompt_engineer", partial(aprompt_batch if use_async else prompt_batch, count=fanout))
+        graph.add_node("probe", aprobe if use_async else probe)
+        graph.add_node("analyzer", collect_probes)
+    else:
+        graph.add_node("prompt_engineer", aprompt_engineer if use_async else prompt_engineer)
+        graph.add_node("analyzer", aresponse_analyzer if use_async else response_analyzer)
     
     # Add conditional edges based on next_agent state
     graph.add_edge("strategist", "prompt_engineer")
-    graph.add_edge("prompt_engineer", "analyzer")
+    if fanout > 1:
+        graph.add_conditional_edges("prompt_engineer", fan_out, ["probe"])
+        graph.add_edge("probe", "analyzer")
+    else:
+        graph.add_edge("prompt_engineer", "analyzer")
     graph.add_conditional_edges(
         "analyzer",
         lambda x: x["next_agent"],
@@ -32,47 +60,151 @@ def build_gandalf_graph() -> StateGraph:
     # Set entry point
     graph.set_entry_point("strategist")
     
-    return graph.compile(checkpointer=MemorySaver())
+    return graph.compile(checkpointer=create_checkpointer())
 
-def solve_gandalf():
-    """Main function to solve the Gandalf challenge."""
-    print("🧙‍♂️ Starting Gandalf Challenge Solver...")
-    
-    # Initialize graph
-    graph = build_gandalf_graph()
-    
+def build_initial_state(defender: Optional[str] = None, level: Optional[int] = None) -> GandalfState:
+    """Build the starting state from the completion and attempts history.
+
+    A defender and level, when given, override the next unsolved level.
+    """
     # Get current level and defender
     current_defender, current_level = get_current_level_info()
+    if defender is not None:
+        current_defender, current_level = defender, level
     print(f"📊 Starting at level {current_level} with defender '{current_defender}'")
     
-    # Load previous attempts history
-    history = load_attempt_history()
-    
-    # Initialize state
-    initial_state = {
+    # Initialize state; previous attempts are read from the history store on demand
+    return {
         "messages": [],
         "current_defender": current_defender,
         "level": current_level,
-        "history": history,
+        "latest_attempt": None,
         "analysis": {},
         "next_agent": "strategist",
-        "completion_history": {"entries": []},
         "attempts": 0,
-        "failed_strategies": 0
+        "failed_strategies": 0,
+        "probes": []
     }
 
+def _report_event(event) -> bool:
+    """Print progress for a streamed state; return True once the run is over."""
+    if isinstance(event, dict) and "next_agent" in event:
+        if event["next_agent"] == END:
+            if event["analysis"].get("budget_exceeded"):
+                print(f"\n💸 Stopped: {event['analysis']['budget_exceeded']}")
+            else:
+                print("\n🎉 Challenge completed!")
+            return True
+        print(f"\n📈 Current level: {event['level']}")
+        print(f"🔄 Next agent: {event['next_agent']}")
+        print("-" * 80)
+    return False
+
+def _thread_config(config: dict, thread_id: Optional[str]) -> dict:
+    """The graph config for a thread; a fresh run gets a new thread id."""
+    thread_id = thread_id or f"run-{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:4]}"
+    return {**config, "configurable": {**config.get("configurable", {}), "thread_id": thread_id}}
+
+def _can_resume(snapshot, thread_id: str) -> bool:
+    if not snapshot.values:
+        print(f"❌ No checkpoint found for thread '{thread_id}'")
+        return False
+    if not snapshot.next:
+        print(f"✅ Thread '{thread_id}' already finished")
+        return False
+    print(f"⏯️ Resuming thread '{thread_id}' at level {snapshot.values['level']} before {', '.join(snapshot.next)}")
+    return True
+
+def solve_gandalf(fanout: int = PROMPT_FANOUT, resume: Optional[str] = None):
+    """Main function to solve the Gandalf challenge.
+
+    With resume, the run continues from the latest checkpoint of that thread
+    instead of starting over; finished steps are not repeated.
+    """
+    print("🧙‍♂️ Starting Gandalf Challenge Solver...")
+    
+    # Initialize graph
+    graph = build_gandalf_graph(fanout=fanout)
+    config = _thread_config(GRAPH_CONFIG, resume)
+    if resume:
+        if not _can_resume(graph.get_state(config), resume):
+            return
+        initial_state = None
+    else:
+        initial_state = build_initial_state()
+        print(f"🧵 Thread '{config['configurable']['thread_id']}'; continue it with --resume if interrupted")
+
     # print("\n🔄 Initial state:", initial_state)
     print("\n🚀 Starting the challenge...\n")
     
-    # Run the graph
-    for event in graph.stream(initial_state, config=GRAPH_CONFIG, stream_mode="values"):
-        if isinstance(event, dict) and "next_agent" in event:
-            if event["next_agent"] == END:
-                print("\n🎉 Challenge completed!")
+    # Run the graph; a None input continues from the checkpoint
+    try:
+        for event in graph.stream(initial_state, config=config, stream_mode="values"):
+            if _report_event(event):
                 break
-            print(f"\n📈 Current level: {event['level']}")
-            print(f"🔄 Next agent: {event['next_agent']}")
-            print("-" * 80)
+    finally:
+        # The spend is checkpointed in the state; a resumed run restores it
+        reset_budget(config["configurable"]["thread_id"])
+
+async def asolve_gandalf(config: dict = GRAPH_CONFIG, fanout: int = PROMPT_FANOUT, resume: Optional[str] = None):
+    """Async variant of solve_gandalf; several can share one event loop."""
+    print("🧙‍♂️ Starting Gandalf Challenge Solver...")
+    
+    graph = build_gandalf_graph(use_async=True, fanout=fanout)
+    config = _thread_config(config, resume)
+    if resume:
+        if not _can_resume(await graph.aget_state(config), resume):
+            return
+        initial_state = None
+    else:
+        initial_state = build_initial_state()
+        print(f"🧵 Thread '{config['configurable']['thread_id']}'; continue it with --resume if interrupted")
+
+    print("\n🚀 Starting the challenge...\n")
+    
+    try:
+        async for event in graph.astream(initial_state, config=config, stream_mode="values"):
+            if _report_event(event):
+                break
+    finally:
+        reset_budget(config["configurable"]["thread_id"])
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Gandalf challenge solver")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="run the agent graph on an asyncio event loop")
+    parser.add_argument("--prefetch", action="store_true", default=PREFETCH_DEFENDERS,
+                        help="load every known defender's info into the cache at startup")
+    parser.add_argument("--fanout", type=int, default=PROMPT_FANOUT, metavar="K",
+                        help="prompts written per step and probed concurrently")
+    parser.add_argument("--api-url", default=None, metavar="URL",
+                        help="Gandalf API base URL, e.g. a local mock_gandalf server")
+    parser.add_argument("--resume", default=None, metavar="THREAD_ID",
+                        help="continue an interrupted run from its latest checkpoint")
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument("--record", nargs="?", const=CASSETTE_FILE, metavar="PATH",
+                          help="record defender API and LLM calls to a cassette file")
+    cassette.add_argument("--replay", metavar="PATH",
+                          help="serve defender API and LLM calls from a recorded cassette")
+    return parser.parse_args()
+
+async def _run_async(fanout: int, resume: Optional[str]):
+    try:
+        await asolve_gandalf(fanout=fanout, resume=resume)
+    finally:
+        await aclose_async_client()
 
 if __name__ == "__main__":
-    solve_gandalf() 
\ No newline at end of file
+    args = parse_args()
+    if args.api_url:
+        core.api.BASE_URL = args.api_url.rstrip("/")
+    if args.record:
+        configure_cassette("record", args.record)
+    elif args.replay:
+        configure_cassette("replay", args.replay)
+    if args.prefetch:
+        prefetch_defender_info()
+    if args.use_async:
+        asyncio.run(_run_async(args.fanout, args.resume))
+    else:
+        solve_gandalf(args.fanout, args.resume)
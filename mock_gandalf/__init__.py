@@ -0,0 +1,10 @@
+from .defenders import MockDefender, default_defenders, keyword_filter
+from .server import MockGandalfServer, start_mock_server
+
+__all__ = [
+    'MockDefender',
+    'default_defenders',
+    'keyword_filter',
+    'MockGandalfServer',
+    'start_mock_server'
+]
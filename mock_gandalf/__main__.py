@@ -0,0 +1,31 @@
+import argparse
+
+from mock_gandalf.defenders import default_defenders
+from mock_gandalf.server import MockGandalfServer
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Local mock of the Gandalf API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every defender call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random +/- seconds around the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of defender calls failing with 503")
+    return parser.parse_args()
+
+def main() -> None:
+    args = parse_args()
+    server = MockGandalfServer(
+        (args.host, args.port),
+        default_defenders(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    )
+    print(f"🧪 Mock Gandalf API on {server.base_url}")
+    print(f"   export GANDALF_API_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from mock_gandalf.defenders import MockDefender, default_defenders
+
+class MockGandalfServer(ThreadingHTTPServer):
+    """Threaded HTTP stand-in for the Gandalf API with scripted defenders."""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address: Tuple[str, int], defenders: Optional[Dict[str, MockDefender]] = None):
+        super().__init__(address, MockGandalfHandler)
+        self.defenders = defenders if defenders is not None else default_defenders()
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def handle_error(self, request, client_address):
+        # Clients cancelling in-flight requests, e.g. losing guesses, are expected
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    def count(self, key: str) -> None:
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def next_defender(self, defender: MockDefender) -> Optional[str]:
+        following = sorted((d for d in self.defenders.values() if d.level > defender.level), key=lambda d: d.level)
+        return following[0].name if following else None
+
+class MockGandalfHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so the solver's pooled sessions are exercised as against the real API
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; avoid the delayed-ACK stall on keep-alive
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status in (429, 503):
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _params(self) -> Dict[str, str]:
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            raw = self.rfile.read(length).decode("utf-8")
+            if "json" in (self.headers.get("Content-Type") or ""):
+                params.update(json.loads(raw))
+            else:
+                params.update({k: v[0] for k, v in parse_qs(raw, keep_blank_values=True).items()})
+        return params
+
+    def _defender(self, params: Dict[str, str]) -> Optional[MockDefender]:
+        defender = self.server.defenders.get(params.get("defender", ""))
+        if defender is None:
+            self._send(200, {"error": f"Unknown defender: {params.get('defender')}"})
+            return None
+        time.sleep(defender.delay())
+        if defender.fails():
+            self.server.count("errors")
+            self._send(defender.error_status, {"error": "Injected failure"})
+            return None
+        return defender
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        params = self._params()
+        self.server.count(path)
+        if path == "/api/stats":
+            with self.server.stats_lock:
+                self._send(200, dict(self.server.stats))
+        elif path == "/api/defender":
+            defender = self._defender(params)
+            if defender:
+                self._send(200, defender.info())
+        else:
+            self._send(404, {"error": f"Not found: {path}"})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        params = self._params()
+        self.server.count(path)
+        if path == "/api/send-message":
+            defender = self._defender(params)
+            if defender:
+                prompt = params.get("prompt", "")
+                self._send(200, {"answer": defender.respond(prompt), "defender": defender.name, "prompt": prompt})
+        elif path == "/api/guess-password":
+            defender = self._defender(params)
+            if defender:
+                if defender.check_guess(params.get("password", "")):
+                    self._send(200, {
+                        "success": True,
+                        "message": "You guessed the password!",
+                        "next_defender": self.server.next_defender(defender)
+                    })
+                else:
+                    self._send(200, {"success": False, "message": "Wrong password."})
+        else:
+            self._send(404, {"error": f"Not found: {path}"})
+
+def start_mock_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    defenders: Optional[Dict[str, MockDefender]] = None
+) -> MockGandalfServer:
+    """Serve in a background thread; port 0 picks a free port, see server.base_url."""
+    server = MockGandalfServer((host, port), defenders)
+    threading.Thread(target=server.serve_forever, name="mock-gandalf", daemon=True).start()
+    return server
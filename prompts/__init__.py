@@ -3,19 +3,31 @@ from .templates import (
     get_strategist_human_message,
     PROMPT_ENGINEER_SYSTEM,
     get_prompt_engineer_human_message,
+    get_duplicate_prompt_message,
+    get_prompt_batch_message,
     ANALYZER_SYSTEM,
     get_analyzer_human_message,
     PASSWORD_EXTRACTOR_SYSTEM,
-    get_password_extractor_human_message
+    get_password_extractor_human_message,
+    STRUCTURED_ANALYZER_SYSTEM,
+    get_analyzer_repair_message
 )
+from .context import build_attempts_context, estimate_tokens, context_stats
 
 __all__ = [
     'STRATEGIST_SYSTEM',
     'get_strategist_human_message',
     'PROMPT_ENGINEER_SYSTEM',
     'get_prompt_engineer_human_message',
+    'get_duplicate_prompt_message',
+    'get_prompt_batch_message',
     'ANALYZER_SYSTEM',
     'get_analyzer_human_message',
     'PASSWORD_EXTRACTOR_SYSTEM',
-    'get_password_extractor_human_message'
+    'get_password_extractor_human_message',
+    'STRUCTURED_ANALYZER_SYSTEM',
+    'get_analyzer_repair_message',
+    'build_attempts_context',
+    'estimate_tokens',
+    'context_stats'
 ] 
\ No newline at end of file
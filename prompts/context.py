@@ -0,0 +1,85 @@
+import json
+from typing import Dict, List, Optional, Tuple
+
+from core.budget import context_scale
+from config.settings import CONTEXT_CHARS_PER_TOKEN, CONTEXT_MAX_RESPONSE_CHARS
+
+# Running totals across every context built in this process
+context_stats = {"calls": 0, "tokens_sent": 0, "tokens_saved": 0}
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count; good enough for budgeting without a tokenizer."""
+    return (len(text) + CONTEXT_CHARS_PER_TOKEN - 1) // CONTEXT_CHARS_PER_TOKEN
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} chars truncated]"
+
+def _normalize(prompt: str) -> str:
+    return " ".join(prompt.lower().split())
+
+def _render_text(index: int, attempt: Dict[str, str]) -> str:
+    return f"Attempt {index + 1}:\n- Prompt: {attempt['prompt']}\n- Response: {attempt['response']}"
+
+def _render_json(attempt: Dict[str, str]) -> str:
+    return json.dumps(attempt, separators=(",", ":"), ensure_ascii=False)
+
+def _full_tokens(attempts: List[Dict[str, str]], style: str) -> int:
+    # Estimated from the field lengths; rendering the whole history just to measure it grows with every attempt
+    if style == "text":
+        chars = sum(len(a["prompt"]) + len(a["response"]) + 36 for a in attempts)
+    else:
+        # indent=2 puts every field on its own line with its quoted key
+        chars = sum(sum(len(key) + len(str(value)) + 12 for key, value in a.items()) + 8 for a in attempts)
+    return (chars + CONTEXT_CHARS_PER_TOKEN - 1) // CONTEXT_CHARS_PER_TOKEN
+
+def _select(attempts: List[Dict[str, str]], budget: int, style: str, recent: Optional[int]) -> List[Tuple[int, Dict[str, str]]]:
+    """Pick the newest distinct attempts that fit in the budget, returned oldest first."""
+    selected = []
+    seen = set()
+    used = 0
+    oldest = max(len(attempts) - recent, 0) if recent is not None else 0
+    for index in range(len(attempts) - 1, oldest - 1, -1):
+        attempt = attempts[index]
+        key = _normalize(attempt["prompt"])
+        if key in seen:
+            continue
+        seen.add(key)
+
+        entry = {
+            "prompt": attempt["prompt"],
+            "response": _truncate(attempt["response"], CONTEXT_MAX_RESPONSE_CHARS)
+        }
+        rendered = _render_text(index, entry) if style == "text" else _render_json(entry)
+        cost = estimate_tokens(rendered) + 1
+        if used + cost > budget:
+            break
+        selected.append((index, entry))
+        used += cost
+
+    selected.reverse()
+    return selected
+
+def build_attempts_context(attempts: List[Dict[str, str]], budget: int, agent: str, style: str = "json", recent: Optional[int] = None) -> str:
+    """Fit attempts into a token budget, newest first, and report the tokens saved.
+
+    style="json" renders a compact JSON list, style="text" the numbered
+    "Attempt N" blocks used by the strategist. recent limits the candidates to
+    the last N attempts; savings are always measured against the full history.
+    The budget shrinks once the run nears its budget limits (core.budget).
+    """
+    selected = _select(attempts, int(budget * context_scale()), style, recent)
+    if style == "text":
+        context = "\n".join(_render_text(index, entry) for index, entry in selected)
+    else:
+        context = "[" + ",".join(_render_json(entry) for _, entry in selected) + "]"
+
+    sent = estimate_tokens(context)
+    saved = max(_full_tokens(attempts, style) - sent, 0)
+    context_stats["calls"] += 1
+    context_stats["tokens_sent"] += sent
+    context_stats["tokens_saved"] += saved
+    print(f"🧮 {agent} context: {len(selected)}/{len(attempts)} attempts, ~{sent} tokens (saved ~{saved})")
+
+    return context
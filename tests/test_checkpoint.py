@@ -0,0 +1,109 @@
+import contextlib
+import io
+import re
+import sys
+from typing import TypedDict
+
+import pytest
+from langgraph.graph import END, START, StateGraph
+
+import core.api
+import main
+from config.settings import CHECKPOINT_FILE, CHECKPOINT_RETENTION
+from core.checkpoint import SqliteCheckpointSaver
+from core.usage import usage_stats
+from mock_gandalf.llm import ScriptedChatModel
+from mock_gandalf.server import start_mock_server
+
+class Counter(TypedDict):
+    count: int
+
+def _orphans(saver: SqliteCheckpointSaver) -> dict:
+    """Rows pruning should have removed: writes of dropped checkpoints and blobs older than any kept version."""
+    kept = saver._conn.execute("SELECT checkpoint_id, type, checkpoint FROM checkpoints").fetchall()
+    oldest = {}
+    for row in kept:
+        for channel, version in saver._loads(row["type"], row["checkpoint"])["channel_versions"].items():
+            oldest[channel] = min(oldest.get(channel, str(version)), str(version))
+    ids = {row["checkpoint_id"] for row in kept}
+    return {
+        "writes": [row["checkpoint_id"] for row in saver._conn.execute("SELECT checkpoint_id FROM writes") if row["checkpoint_id"] not in ids],
+        "blobs": [
+            (row["channel"], row["version"]) for row in saver._conn.execute("SELECT channel, version FROM blobs")
+            if row["channel"] in oldest and row["version"] < oldest[row["channel"]]
+        ]
+    }
+
+def test_resume_skips_finished_steps_and_prunes(tmp_path):
+    calls = []
+
+    def step(state: Counter) -> Counter:
+        calls.append(state["count"])
+        if state["count"] == 5 and calls.count(5) == 1:
+            raise RuntimeError("interrupted")
+        return {"count": state["count"] + 1}
+
+    graph = StateGraph(Counter)
+    graph.add_node("step", step)
+    graph.add_edge(START, "step")
+    graph.add_conditional_edges("step", lambda state: END if state["count"] >= 8 else "step")
+    saver = SqliteCheckpointSaver(tmp_path / "checkpoints.db", retention=3)
+    app = graph.compile(checkpointer=saver)
+    config = {"configurable": {"thread_id": "t"}}
+
+    with pytest.raises(RuntimeError):
+        app.invoke({"count": 0}, config)
+    assert app.get_state(config).values == {"count": 5}
+    assert app.get_state(config).next == ("step",)
+
+    assert app.invoke(None, config) == {"count": 8}
+    # Only the failed step ran twice
+    assert calls == [0, 1, 2, 3, 4, 5, 5, 6, 7]
+    assert len(list(saver.list(config))) == 3
+    assert _orphans(saver) == {"writes": [], "blobs": []}
+    saver.close()
+
+class CrashingChatModel(ScriptedChatModel):
+    crash_at: int = 10**9
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if usage_stats["calls"] >= self.crash_at:
+            raise RuntimeError("simulated crash")
+        return super()._generate(messages, stop, run_manager, **kwargs)
+
+def _install_llm(monkeypatch, llm) -> None:
+    for name in ("strategist", "prompt_engineer", "analyzer"):
+        monkeypatch.setattr(sys.modules[f"agents.{name}"], "llm", llm)
+
+def test_interrupted_run_resumes_from_checkpoint(tmp_path, monkeypatch):
+    # Everything the solver persists is relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "GRAPH_CONFIG", {"configurable": {}, "recursion_limit": 500})
+    server = start_mock_server()
+    monkeypatch.setattr(core.api, "BASE_URL", server.base_url)
+    output = io.StringIO()
+    try:
+        _install_llm(monkeypatch, CrashingChatModel(crash_at=usage_stats["calls"] + 20))
+        with contextlib.redirect_stdout(output), pytest.raises(RuntimeError, match="simulated crash"):
+            main.solve_gandalf()
+        thread_id = re.search(r"🧵 Thread '([^']+)'", output.getvalue()).group(1)
+
+        _install_llm(monkeypatch, ScriptedChatModel())
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main.solve_gandalf(resume=thread_id)
+        resumed = re.search(r"Resuming thread '[^']+' at level (\d+)", output.getvalue())
+        assert resumed and int(resumed.group(1)) > 1
+        assert "Challenge completed" in output.getvalue()
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main.solve_gandalf(resume=thread_id)
+        assert "already finished" in output.getvalue()
+    finally:
+        server.shutdown()
+
+    saver = SqliteCheckpointSaver(tmp_path / CHECKPOINT_FILE)
+    assert len(list(saver.list({"configurable": {"thread_id": thread_id}}))) == CHECKPOINT_RETENTION
+    assert _orphans(saver) == {"writes": [], "blobs": []}
+    saver.close()